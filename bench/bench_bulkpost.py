@@ -0,0 +1,64 @@
+'''bench_bulkpost -- events per second posted one at a time or in bulk
+
+Usage: python bench/bench_bulkpost.py [events [threads [batch]]]
+
+Posts small JSON-ish events to an in-process keep-alive stand-in for
+an ingest endpoint, over pooled connections: first one request per
+event with `WebPostable.post`, then in batches with a `BulkPoster`,
+without and with gzip compression.
+'''
+
+import time
+
+
+def main(argv, Request, ThreadPool, clock):
+    from ocap.laweb import WebPostable
+    from ocap.webpool import (ConnectionPool, build_pooled_opener,
+                              _serveLocal, _Ingest)
+
+    events, threads, batch = ([int(a) for a in argv[1:4]] +
+                              [5000, 4, 200][len(argv[1:4]):])
+    server, base = _serveLocal(_Ingest)
+    conns = ConnectionPool(maxPerHost=threads)
+    workers = ThreadPool(threads)
+    doweb = WebPostable(base, build_pooled_opener(conns), Request)
+    payloads = ['{"seq": %d, "kind": "click", "page": "/docs/%d"}'
+                % (n, n % 50) for n in range(events)]
+
+    try:
+        t0 = clock()
+        workers.map(lambda p: doweb.post(p).read(), payloads)
+        dt = clock() - t0
+        print('%-10s %8.0f events/s' % ('single', events / dt))
+
+        for label, compress in [('bulk', False), ('bulk+gzip', True)]:
+            bulk = doweb.bulkPoster(workers, maxItems=batch,
+                                    compress=compress)
+            t0 = clock()
+            results = [bulk.post(p) for p in payloads]
+            bulk.flush()
+            for r in results:
+                r.get(60)
+            dt = clock() - t0
+            stats = bulk.stats()
+            print('%-10s %8.0f events/s  %d batches, %d of %d bytes sent'
+                  % (label, events / dt, stats['batches'],
+                     stats['sentBytes'], stats['rawBytes']))
+    finally:
+        workers.close()
+        conns.close()
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    def _script():
+        from multiprocessing.pool import ThreadPool
+        from sys import argv, path
+        from urllib2 import Request
+        import os
+
+        path.insert(0, os.path.dirname(os.path.dirname(
+            os.path.abspath(__file__))))
+        main(argv, Request, ThreadPool, time.time)
+
+    _script()
@@ -0,0 +1,65 @@
+'''bench_copytree -- tree copy throughput
+
+Usage: python bench/bench_copytree.py [dirs [files [kbytes]]]
+
+Builds a scratch tree of `dirs` x `files` files of `kbytes` each and
+copies it three ways: a getBytes/setBytes loop over `walk_ed`,
+`Editable.copyTreeTo`, and `copyTreeTo` with a pool of 4 threads.
+'''
+
+import time
+
+
+def main(argv, os, openf, mkdtemp, ThreadPool, clock):
+    from ocap.lafile import Editable, walk_ed, relName
+
+    dirs, files, kbytes = ([int(a) for a in argv[1:4]] +
+                           [8, 32, 512][len(argv[1:4]):])
+    tmp = Editable(mkdtemp(), os, openf)
+    src = tmp / 'src'
+    src.mkDir()
+    blob = os.urandom(kbytes * 1024)
+    for d in range(dirs):
+        sub = src / ('d%d' % d)
+        sub.mkDir()
+        for f in range(files):
+            (sub / ('f%d' % f)).setBytes(blob)
+    size = dirs * files * kbytes / 1024.0
+
+    def loop(dest):
+        for top, ds, fs in walk_ed(src):
+            there = dest if top is src else dest / relName(top, src)
+            for d in ds:
+                (there / relName(d, top)).mkDir()
+            for f in fs:
+                (there / relName(f, top)).setBytes(f.ro().getBytes())
+
+    pool = ThreadPool(4)
+    ways = [('getBytes/setBytes', loop),
+            ('copyTreeTo', lambda dest: src.copyTreeTo(dest)),
+            ('copyTreeTo x4', lambda dest: src.copyTreeTo(dest, pool))]
+    try:
+        for ix, (label, copy) in enumerate(ways):
+            dest = tmp / ('dest%d' % ix)
+            dest.mkDir()
+            t0 = clock()
+            copy(dest)
+            dt = clock() - t0
+            print('%-18s %8.1f MB/s' % (label, size / dt))
+    finally:
+        pool.close()
+        tmp.deleteTree()
+
+
+if __name__ == '__main__':
+    def _script():
+        from multiprocessing.pool import ThreadPool
+        from sys import argv, path
+        from tempfile import mkdtemp
+        import os
+
+        path.insert(0, os.path.dirname(os.path.dirname(
+            os.path.abspath(__file__))))
+        main(argv, os, open, mkdtemp, ThreadPool, time.time)
+
+    _script()
@@ -0,0 +1,101 @@
+'''bench_eventual -- event-loop latency under concurrent file traffic
+
+Usage: python bench/bench_eventual.py [files [kbytes [seconds [ms]]]]
+
+A stand-in event loop ticks every millisecond for a fixed time while
+it keeps a stream of reads and directory walks going over a scratch
+tree. Storage is given `ms` milliseconds of latency per open, as on a
+network filesystem. We report how late the ticks run when the loop
+makes the calls itself (blocking) and when it goes through
+`ocap.eventual` facades with at most 8 operations in flight.
+'''
+
+import time
+
+
+def main(argv, os, openf, mkdtemp, ThreadPool, clock, sleep):
+    from collections import deque
+    from ocap.lafile import Editable, walk_rd
+    from ocap.eventual import AsyncEditable
+
+    files, kbytes, seconds, ms = ([int(a) for a in argv[1:5]] +
+                                  [200, 64, 2, 5][len(argv[1:5]):])
+    tmp = mkdtemp()
+    ed = Editable(tmp, os, openf)
+    blob = os.urandom(kbytes * 1024)
+    names = ['f%04d' % ix for ix in range(files)]
+    for n in names:
+        (ed / n).setBytes(blob)
+
+    def slow_open(p, mode='r'):
+        sleep(ms / 1000.0)
+        return openf(p, mode)
+
+    slow = Editable(tmp, os, slow_open)
+    rd = slow.ro()
+
+    def run(label, issue):
+        lateness = []
+        done = [0]
+        deadline = clock() + seconds
+        nxt = clock()
+        ix = 0
+        while nxt < deadline:
+            now = clock()
+            if now < nxt:
+                sleep(nxt - now)
+            start = clock()
+            lateness.append(start - nxt)
+            issue(ix, done)
+            ix += 1
+            nxt = start + 0.001
+        lateness.sort()
+        print('%-9s ticks=%5d ops=%5d p50=%7.3fms p99=%7.3fms max=%7.3fms' % (
+            label, len(lateness), done[0],
+            1000 * lateness[len(lateness) // 2],
+            1000 * lateness[int(len(lateness) * 0.99)],
+            1000 * lateness[-1]))
+
+    def blocking(ix, done):
+        (rd / names[ix % files]).getBytes()
+        if ix % 100 == 0:
+            list(walk_rd(rd))
+        done[0] += 1
+
+    pool = ThreadPool(8)
+    ard = AsyncEditable(slow, pool).ro()
+    inflight = deque()
+
+    def eventual(ix, done):
+        while inflight and inflight[0].isResolved():
+            inflight.popleft()
+            done[0] += 1
+        if len(inflight) >= 8:
+            return
+        inflight.append((ard / names[ix % files]).getBytes())
+        if ix % 100 == 0:
+            ard.walk().next()
+
+    try:
+        run('blocking', blocking)
+        run('eventual', eventual)
+    finally:
+        pool.close()
+        pool.join()
+        for n in names:
+            (ed / n).delete()
+        os.rmdir(tmp)
+
+
+if __name__ == '__main__':
+    def _script():
+        from multiprocessing.pool import ThreadPool
+        from sys import argv, path
+        from tempfile import mkdtemp
+        import os
+
+        path.insert(0, os.path.dirname(os.path.dirname(
+            os.path.abspath(__file__))))
+        main(argv, os, open, mkdtemp, ThreadPool, time.time, time.sleep)
+
+    _script()
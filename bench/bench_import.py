@@ -0,0 +1,97 @@
+'''bench_import -- import-time budget for the ocap package
+
+Usage: python bench/bench_import.py [runs]
+
+Imports each module in `BUDGETS` in a fresh interpreter and checks
+its cost, in milliseconds, against its budget; the exit status is 1
+if any module is over. Where the interpreter supports `-X importtime`
+(python 3.7 and later), the cost is the cumulative time it reports
+for the module. Otherwise it is the best wall-clock time, over `runs`
+tries, of `python -c "import m"` less that of `python -c pass`;
+tries of each are interleaved, so that drift in machine load affects
+them alike.
+Modules are imported once beforehand, so that compiled bytecode is
+on hand, as in an installed package.
+'''
+
+import time
+
+BUDGETS = [  # (module, ms)
+    ('ocap', 1.0),
+    ('ocap.encap', 1.0),
+    ('ocap.sealing', 1.5),
+    ('ocap.lafile', 2.0),
+    ('ocap.laweb', 2.5),
+]
+
+
+def main(argv, executable, Popen, PIPE, clock, cwd, environ):
+    runs = int(argv[1]) if argv[1:] else 20
+    env = dict((k, v) for (k, v) in environ.items()
+               if k != 'PYTHONDONTWRITEBYTECODE')
+
+    def run(args):
+        p = Popen([executable] + args, cwd=cwd, env=env,
+                  stdout=PIPE, stderr=PIPE)
+        _, err = p.communicate()
+        return p.returncode, err
+
+    def importtime(module):
+        status, err = run(['-X', 'importtime', '-c', 'import ' + module])
+        if status != 0:
+            return None
+        for line in err.decode('utf-8').splitlines():
+            if line.startswith('import time:'):
+                cells = [c.strip() for c in line[len('import time:'):]
+                         .split('|')]
+                if cells[2].strip() == module:
+                    return int(cells[1]) / 1000.0
+        return None
+
+    def wallclock(codes):
+        best = dict((code, None) for code in codes)
+        for _ in range(runs):
+            for code in codes:
+                t0 = clock()
+                status, err = run(['-c', code])
+                dt = (clock() - t0) * 1000
+                if status != 0:
+                    raise SystemExit(err)
+                if best[code] is None or dt < best[code]:
+                    best[code] = dt
+        return best
+
+    for module, _ in BUDGETS:
+        run(['-c', 'import ' + module])
+    usesImporttime = importtime('ocap') is not None
+    if not usesImporttime:
+        best = wallclock(['pass'] + ['import ' + m for (m, _) in BUDGETS])
+    over = 0
+    for module, budget in BUDGETS:
+        if usesImporttime:
+            cost = importtime(module)
+        else:
+            cost = best['import ' + module] - best['pass']
+        if cost is None:  # the module failed to import
+            over += 1
+            print('%-14s %6s     budget %5.2f  FAILED'
+                  % (module, '-', budget))
+            continue
+        ok = cost <= budget
+        over += not ok
+        print('%-14s %6.2f ms  budget %5.2f  %s'
+              % (module, cost, budget, 'ok' if ok else 'OVER'))
+    return over
+
+
+if __name__ == '__main__':
+    def _script():
+        from subprocess import PIPE, Popen
+        from sys import argv, executable
+        import os
+
+        top = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        if main(argv, executable, Popen, PIPE, time.time, top, os.environ):
+            raise SystemExit(1)
+
+    _script()
@@ -0,0 +1,52 @@
+'''bench_membrane -- per-call overhead of membrane wrappers
+
+Usage: python bench/bench_membrane.py [calls]
+
+Calls a few capability methods directly and through a `Membrane`
+wrapper, and reports the time per call for each.
+'''
+
+import time
+
+
+def main(argv, os, openf, mkdtemp, clock):
+    from ocap.lafile import Editable
+    from ocap.membrane import Membrane
+    from money_ex import Mint
+
+    calls = int(argv[1]) if argv[1:] else 200000
+    tmp = Editable(mkdtemp(), os, openf)
+    purse = Mint('Carol').makePurse(100)
+    cases = [
+        ('purse.getBalance()', purse, lambda p: p.getBalance()),
+        ('rd.fullPath()', tmp.ro(), lambda rd: rd.fullPath()),
+        ('ed.ro()', tmp, lambda ed: ed.ro()),
+    ]
+
+    def perCall(f, obj):
+        t0 = clock()
+        for _ in xrange(calls):
+            f(obj)
+        return (clock() - t0) / calls * 1e9
+
+    try:
+        for label, obj, f in cases:
+            direct = perCall(f, obj)
+            wrapped = perCall(f, Membrane().wrap(obj))
+            print('%-20s %6.0f ns direct %6.0f ns wrapped (+%.0f ns)'
+                  % (label, direct, wrapped, wrapped - direct))
+    finally:
+        tmp.deleteTree()
+
+
+if __name__ == '__main__':
+    def _script():
+        from sys import argv, path
+        from tempfile import mkdtemp
+        import os
+
+        path.insert(0, os.path.dirname(os.path.dirname(
+            os.path.abspath(__file__))))
+        main(argv, os, open, mkdtemp, time.time)
+
+    _script()
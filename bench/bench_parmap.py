@@ -0,0 +1,77 @@
+'''bench_parmap -- scaling of map_rd across worker processes
+
+Usage: python bench/bench_parmap.py [files [kbytes [rounds [procs]]]]
+
+Builds a scratch tree of `files` files of `kbytes` of text each and
+runs a CPU-bound digest of each file (`rounds` of SHA-256 over its
+words) with `ocap.parmap.map_rd` on 1, 2, 4, ... worker processes,
+up to `procs` (by default, the number of cores), reporting files per
+second and speedup.
+'''
+
+import time
+
+
+def digest(rd):
+    from hashlib import sha256
+    h = sha256()
+    words = rd.getBytes().split()
+    for _ in range(_ROUNDS[0]):
+        for w in words:
+            h.update(w)
+    return h.hexdigest()
+
+
+_ROUNDS = [4]  # set before the workers fork
+
+
+def main(argv, os, openf, mkdtemp, Pool, cpu_count, clock):
+    from ocap.lafile import Editable
+    from ocap.parmap import init_worker, map_rd
+
+    files, kbytes, _ROUNDS[0], procs = (
+        [int(a) for a in argv[1:5]] +
+        [400, 64, 4, cpu_count()][len(argv[1:5]):])
+    tmp = Editable(mkdtemp(), os, openf)
+    text = ' '.join('w%d' % (n % 997) for n in range(kbytes * 200))
+    for d in range(4):
+        sub = tmp / ('d%d' % d)
+        sub.mkDir()
+        for f in range(files // 4):
+            (sub / ('f%d.txt' % f)).setBytes(text)
+
+    counts, n = [], 1
+    while n < procs:
+        counts.append(n)
+        n *= 2
+    counts.append(procs)
+
+    try:
+        base = None
+        for n in counts:
+            pool = Pool(n, initializer=init_worker)
+            t0 = clock()
+            done = sum(1 for _ in map_rd(tmp.ro(), digest, pool,
+                                         ordered=False))
+            dt = clock() - t0
+            pool.close()
+            pool.join()
+            base = base or dt
+            print('%2d processes %8.1f files/s  x%.2f'
+                  % (n, done / dt, base / dt))
+    finally:
+        tmp.deleteTree()
+
+
+if __name__ == '__main__':
+    def _script():
+        from multiprocessing import Pool, cpu_count
+        from sys import argv, path
+        from tempfile import mkdtemp
+        import os
+
+        path.insert(0, os.path.dirname(os.path.dirname(
+            os.path.abspath(__file__))))
+        main(argv, os, open, mkdtemp, Pool, cpu_count, time.time)
+
+    _script()
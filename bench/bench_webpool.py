@@ -0,0 +1,54 @@
+'''bench_webpool -- WebReadable requests per second, pooled or not
+
+Usage: python bench/bench_webpool.py [requests [threads]]
+
+Serves small pages from an in-process keep-alive HTTP server and
+reads them through `WebReadable` subordinates, first with the default
+urllib2 opener and then with a pooled opener.
+'''
+
+import time
+
+
+def main(argv, build_opener, Request, ThreadPool, clock):
+    from ocap.laweb import WebReadable
+    from ocap.webpool import (ConnectionPool, build_pooled_opener,
+                              _serveLocal, _Pages)
+
+    requests, threads = ([int(a) for a in argv[1:3]] +
+                         [2000, 4][len(argv[1:3]):])
+    server, base = _serveLocal(_Pages)
+    conns = ConnectionPool(maxPerHost=threads)
+    workers = ThreadPool(threads)
+
+    def fetch(root):
+        return lambda ix: root.subRdFile('p%d' % ix).getBytes()
+
+    try:
+        for label, opener in [('default', build_opener()),
+                              ('pooled', build_pooled_opener(conns))]:
+            root = WebReadable(base, opener, Request)
+            t0 = clock()
+            workers.map(fetch(root), range(requests))
+            dt = clock() - t0
+            print('%-8s %8.0f requests/s' % (label, requests / dt))
+        print('connections: %(opened)d opened, %(reused)d reused'
+              % conns.stats())
+    finally:
+        workers.close()
+        conns.close()
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    def _script():
+        from multiprocessing.pool import ThreadPool
+        from sys import argv, path
+        from urllib2 import build_opener, Request
+        import os
+
+        path.insert(0, os.path.dirname(os.path.dirname(
+            os.path.abspath(__file__))))
+        main(argv, build_opener, Request, ThreadPool, time.time)
+
+    _script()
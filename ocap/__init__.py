@@ -27,3 +27,42 @@ If you have nose__ installed, you can test all modules::
 __ http://readthedocs.org/docs/nose/en/latest/
 
 '''
+
+import sys
+from types import ModuleType
+
+_SUBMODULES = frozenset([
+    'encap', 'eventual', 'findindex', 'guard', 'lafile', 'laweb',
+    'membrane', 'merkle', 'notary', 'parmap', 'rewalk', 'sealing',
+    'webcache', 'webpool'])
+
+
+class _LazyPackage(ModuleType):
+    '''The `ocap` package, importing each submodule on first use, so
+    that `import ocap` costs next to nothing::
+
+      import ocap
+      ocap.lafile.Readable  # imports ocap.lafile just now
+    '''
+    def __getattr__(self, name):
+        if name not in _SUBMODULES:
+            raise AttributeError("'module' object has no attribute %r"
+                                 % (name,))
+        __import__('%s.%s' % (self.__name__, name))
+        return sys.modules['%s.%s' % (self.__name__, name)]
+
+    def __dir__(self):
+        return sorted(set(self.__dict__) | _SUBMODULES)
+
+
+def _becomeLazy(name):
+    this = sys.modules[name]
+    lazy = _LazyPackage(name, this.__doc__)
+    lazy.__dict__.update(this.__dict__)
+    # python 2 clears a module's globals when it is collected; keep
+    # this one, whose globals the functions above refer to.
+    lazy.__dict__['_module'] = this
+    sys.modules[name] = lazy
+
+
+_becomeLazy(__name__)
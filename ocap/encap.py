@@ -1,6 +1,10 @@
 '''encap -- lexical scoping for encapsulation
 '''
 
+import sys
+
+_watchers = []  # called with each new ESuite instance, while a Census runs
+
 
 class ESuite(object):
     '''ESuite -- Encapsulated (or: E-like) method suite
@@ -63,7 +67,11 @@ class ESuite(object):
         suite = dict(arg_methods + delegate_methods,
                      **kwargs)
 
-        return type(cls.__name__, (ESuite, object), suite)()
+        it = type(cls.__name__, (ESuite, object), suite)()
+        if _watchers:
+            for watch in _watchers:
+                watch(it)
+        return it
 
 
 def slot(obj):
@@ -83,3 +91,167 @@ def val(slot):
 
 def update(slot, val):
     slot[0] = val
+
+
+class Census(ESuite):
+    '''Count live ESuite instances by class name, from now until `stop`.
+
+    Each ESuite instance has a type of its own, so a leak of `Purse`
+    objects shows up as growth in anonymous types; a census ties it
+    back to the class name::
+
+      >>> class Box(ESuite):
+      ...     def __new__(cls, contents):
+      ...         def get(_):
+      ...             return contents
+      ...         return cls.make(get)
+
+      >>> census = Census(sites=True)
+      >>> before = census.snapshot()
+      >>> boxes = [Box(n) for n in range(3)]
+      >>> after = census.snapshot()
+      >>> [(name, count) for (name, count, size) in diff_census(before, after)]
+      [('Box', 3)]
+
+    Sizes are approximate: the instance, its type, and the functions
+    of its suite, but not what their closures refer to::
+
+      >>> after['Box'][1] > 3 * sys.getsizeof(boxes[0])
+      True
+
+    With `sites`, a census also notes where instances are made; it
+    uses `tracemalloc` if that is tracing, or else the caller of
+    `__new__`::
+
+      >>> census.sites('Box')
+      ... # doctest: +ELLIPSIS
+      [('<doctest ...Census[3]>:1', 3)]
+
+      >>> del boxes
+      >>> census.snapshot().get('Box')
+      >>> census.stop()
+
+    While no census runs, `make` checks one empty list.
+    '''
+    def __new__(cls, sites=False, getsizeof=sys.getsizeof):
+        from threading import Lock
+        from weakref import ref
+
+        lock = Lock()
+        live = {}  # id(obj) -> (weak ref, name, site)
+        dead = []  # (id, weak ref) of instances since collected
+
+        def reap():
+            '''Drop entries of collected instances; call with `lock` held.
+
+            Weak ref callbacks only note the dead, without the lock,
+            since the collector may call them on a thread that holds it.
+            '''
+            while dead:
+                k, r = dead.pop()
+                if live.get(k, (None,))[0] is r:
+                    del live[k]
+
+        def watch(obj):
+            k = id(obj)
+
+            def gone(r):
+                dead.append((k, r))
+            site = _site(obj) if sites else None
+            with lock:
+                reap()
+                live[k] = (ref(obj, gone), type(obj).__name__, site)
+
+        def snapshot(_):
+            '''Map each class name to (live instances, approximate bytes).
+            '''
+            with lock:
+                reap()
+                entries = list(live.values())
+            counts = {}
+            for r, name, _site in entries:
+                obj = r()
+                if obj is None:
+                    continue
+                n, size = counts.get(name, (0, 0))
+                counts[name] = (n + 1, size + _approxSize(obj, getsizeof))
+            return counts
+
+        def sites_(_, name, limit=10):
+            '''Where live instances of class `name` were made, most
+            common first.
+            '''
+            with lock:
+                reap()
+                found = [site for (r, n, site) in live.values()
+                         if n == name and r() is not None]
+            tally = {}
+            for site in found:
+                tally[site] = tally.get(site, 0) + 1
+            return sorted(tally.items(), key=lambda kv: -kv[1])[:limit]
+
+        def stop(_):
+            if watch in _watchers:
+                _watchers.remove(watch)
+            with lock:
+                live.clear()
+                del dead[:]
+
+        census = cls.make(snapshot, stop, sites=sites_)
+        _watchers.append(watch)
+        return census
+
+
+def diff_census(before, after):
+    '''Changes between two census snapshots, largest growth first.
+
+    :return: list of (class name, change in count, change in bytes)
+    '''
+    changes = []
+    for name in set(before) | set(after):
+        n0, b0 = before.get(name, (0, 0))
+        n1, b1 = after.get(name, (0, 0))
+        if (n0, b0) != (n1, b1):
+            changes.append((name, n1 - n0, b1 - b0))
+    return sorted(changes, key=lambda c: (-c[2], c[0]))
+
+
+def _approxSize(obj, getsizeof):
+    t = type(obj)
+    size = getsizeof(obj) + getsizeof(t) + getsizeof(t.__dict__)
+    for f in t.__dict__.values():
+        if hasattr(f, '__code__'):
+            size += getsizeof(f)
+            for cell in getattr(f, '__closure__', None) or ():
+                size += getsizeof(cell)
+    return size
+
+
+def _site(obj, skip=4):
+    '''Where was `obj` made?
+
+    The caller of `__new__` is `skip` frames up, if the stack is that
+    deep, as it may not be for an instance made at the top level::
+
+      >>> _site(None, skip=1000)
+      '?'
+    '''
+    tracemalloc = sys.modules.get('tracemalloc')  # imported if tracing
+    if tracemalloc is not None and tracemalloc.is_tracing():
+        tb = tracemalloc.get_object_traceback(obj)
+        # most recent first, skipping make and then __new__, if the
+        # traceback is deep enough (see tracemalloc.start(nframe)).
+        frames = [fr for fr in reversed(list(tb or ()))
+                  if fr.filename != _site.__code__.co_filename]
+        if frames:
+            fr = frames[min(1, len(frames) - 1)]
+            return '%s:%d' % (fr.filename, fr.lineno)
+    # _site <- watch <- make <- __new__ <- the caller
+    f = sys._getframe()
+    for _ in range(skip):
+        if f is None:
+            break
+        f = f.f_back
+    if f is None:
+        return '?'
+    return '%s:%d' % (f.f_code.co_filename, f.f_lineno)
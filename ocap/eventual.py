@@ -0,0 +1,333 @@
+'''eventual -- non-blocking facades for file capabilities
+
+`AsyncReadable` and `AsyncEditable` offer the least-authority surface of
+:mod:`lafile`, but each operation that touches the filesystem runs on a
+bounded pool of worker threads and returns a `Promise` at once, in
+the style of E's eventual sends::
+
+  >>> import os, tempfile
+  >>> from multiprocessing.pool import ThreadPool
+  >>> from lafile import Editable
+  >>> pool = ThreadPool(2)
+  >>> tmp = tempfile.mkdtemp()
+  >>> ed = AsyncEditable(Editable(tmp, os, open), pool)
+
+  >>> p = (ed / 'greeting').setBytes('hello, world')
+  >>> p.get(5)
+  >>> rd = ed.ro()
+  >>> (rd / 'greeting').getBytes().get(5)
+  'hello, world'
+
+Callbacks registered with `when` run on a worker thread; an event loop
+should hand them back to its own thread (e.g. Twisted's
+`reactor.callFromThread`, or `loop.call_soon_threadsafe` in asyncio)::
+
+  >>> got = []
+  >>> done = rd.isDir().when(got.append)
+  >>> done.get(5); got
+  [True]
+
+Failures break the promise rather than escape into the pool::
+
+  >>> (rd / 'nosuch').getBytes().get(5)
+  ... # doctest: +ELLIPSIS
+  Traceback (most recent call last):
+    ...
+  IOError: [Errno 2] No such file or directory: '...nosuch'
+
+Listings, walks, and file contents stream through a `Channel`, whose
+`next()` gives a promise for the next item, or for `END`::
+
+  >>> pages = rd.iterSubRdFiles()
+  >>> [sub.fullPath().endswith('greeting') for sub in pages.next().get(5)]
+  [True]
+  >>> pages.next().get(5) is END
+  True
+
+  >>> chunks = (rd / 'greeting').readChunks(5)
+  >>> ''.join(iter(lambda: chunks.next().get(5), END))
+  'hello, world'
+
+  >>> w = (ed / 'log').writeChunks()
+  >>> written = [w.write(chunk) for chunk in ['a', 'b', 'c']]
+  >>> w.close().get(5)
+  >>> (rd / 'log').getBytes().get(5)
+  'abc'
+
+  >>> for n in ['greeting', 'log']: os.remove(os.path.join(tmp, n))
+  >>> os.rmdir(tmp); pool.close()
+
+'''
+
+from collections import deque
+from threading import Event, Lock
+
+from encap import ESuite, slot, val, update
+from lafile import _paged, walk_rd
+
+END = object()
+
+
+class Promise(ESuite):
+    '''Placeholder for the outcome of an eventual operation.
+
+    >>> p, resolve, smash = makePromise()
+    >>> resolve(42)
+    >>> p.get(), p.isResolved()
+    (42, True)
+    '''
+    def __new__(cls, outcome, done, callbacks, lock):
+        def isResolved(_):
+            return done.is_set()
+
+        def get(_, timeout=None):
+            if not done.wait(timeout):
+                raise RuntimeError('promise not resolved in time')
+            ok, value = val(outcome)
+            if not ok:
+                raise value
+            return value
+
+        def when(_, ok, broken=None):
+            '''Arrange to call `ok` (or `broken`) once resolved.
+
+            Returns a promise for the callback's result.
+            '''
+            p, resolve, smash = makePromise()
+
+            def fire():
+                good, value = val(outcome)
+                try:
+                    if good:
+                        resolve(ok(value))
+                    elif broken is not None:
+                        resolve(broken(value))
+                    else:
+                        smash(value)
+                except Exception as ex:
+                    smash(ex)
+
+            with lock:
+                if not done.is_set():
+                    callbacks.append(fire)
+                    return p
+            fire()
+            return p
+
+        return cls.make(isResolved, get, when)
+
+
+def makePromise():
+    '''Make a (promise, resolve, smash) triple.
+    '''
+    outcome = slot(None)
+    done = Event()
+    callbacks = []
+    lock = Lock()
+
+    def settle(ok, value):
+        with lock:
+            if done.is_set():
+                return
+            update(outcome, (ok, value))
+            done.set()
+            ready = callbacks[:]
+            del callbacks[:]
+        for fire in ready:
+            fire()
+
+    return (Promise(outcome, done, callbacks, lock),
+            lambda value: settle(True, value),
+            lambda ex: settle(False, ex))
+
+
+def spawn(pool, f, *args):
+    '''Run `f(*args)` on `pool`; return a promise for the result.
+    '''
+    p, resolve, smash = makePromise()
+
+    def task():
+        try:
+            resolve(f(*args))
+        except Exception as ex:
+            smash(ex)
+
+    pool.apply_async(task)
+    return p
+
+
+def _serial(pool):
+    '''Make a `submit` function that runs steps on `pool` one at a time,
+    in the order they were submitted.
+
+    At most one step is on the pool at once; each submits the next
+    as it finishes, so a long queue doesn't tie up the workers.
+    '''
+    pending = deque()
+    lock = Lock()
+    running = slot(False)
+
+    def step():
+        with lock:
+            f, resolve, smash = pending.popleft()
+        try:
+            ok, value = True, f()
+        except Exception as ex:
+            ok, value = False, ex
+        with lock:
+            if pending:
+                pool.apply_async(step)
+            else:
+                update(running, False)
+        # callbacks may wait on later steps, so settle after the
+        # next one is on its way
+        (resolve if ok else smash)(value)
+
+    def submit(f):
+        p, resolve, smash = makePromise()
+        with lock:
+            pending.append((f, resolve, smash))
+            if not val(running):
+                update(running, True)
+                pool.apply_async(step)
+        return p
+
+    return submit
+
+
+class Channel(ESuite):
+    '''Eventual iterator: drain `items` on `pool`, `ahead` at a time.
+
+    A callback may wait on the channel's next item::
+
+    >>> from multiprocessing.pool import ThreadPool
+    >>> pool, go = ThreadPool(2), Event()
+    >>> def items():
+    ...     go.wait(5)
+    ...     for x in 'ab':
+    ...         yield x
+    >>> ch = Channel(items(), pool)
+    >>> both = ch.next().when(lambda a: a + ch.next().get(5))
+    >>> go.set(); both.get(5)
+    'ab'
+    >>> pool.close()
+    '''
+    def __new__(cls, items, pool, ahead=2):
+        submit = _serial(pool)
+        it = iter(items)
+        queued = deque(submit(lambda: next(it, END))
+                       for _ in range(ahead))
+
+        def next_(_):
+            queued.append(submit(lambda: next(it, END)))
+            return queued.popleft()
+
+        return cls.make(next=next_)
+
+
+class Writer(ESuite):
+    '''Eventual output stream; writes happen in order on `pool`.
+    '''
+    def __new__(cls, outChannel, pool):
+        submit = _serial(pool)
+        out = slot(None)
+
+        def opened():
+            if val(out) is None:
+                update(out, outChannel())
+            return val(out)
+
+        def write(_, chunk):
+            return submit(lambda: opened().write(chunk))
+
+        def close(_):
+            return submit(lambda: opened().close())
+
+        return cls.make(write, close)
+
+
+class AsyncReadable(ESuite):
+    '''Eventual facade on a Readable.
+    '''
+    def __new__(cls, rd, pool):
+        def wrap(sub):
+            return AsyncReadable(sub, pool)
+
+        def isDir(_):
+            return spawn(pool, rd.isDir)
+
+        def exists(_):
+            return spawn(pool, rd.exists)
+
+        def subRdFiles(_):
+            return spawn(pool, lambda: [wrap(s) for s in rd.subRdFiles()])
+
+        def subRdFile(_, n):
+            return wrap(rd.subRdFile(n))
+
+        def iterSubRdFiles(_, pageSize=100):
+            return Channel(_paged((wrap(s) for s in rd.iterSubRdFiles()),
+                                  pageSize), pool)
+
+        def walk(_):
+            return Channel(((wrap(top), [wrap(d) for d in dirs],
+                             [wrap(f) for f in files])
+                            for (top, dirs, files) in walk_rd(rd, lazy=True)),
+                           pool)
+
+        def getBytes(_):
+            return spawn(pool, rd.getBytes)
+
+        def readChunks(_, size=1 << 16, ahead=2):
+            def chunks():
+                f = rd.inChannel()
+                try:
+                    for chunk in iter(lambda: f.read(size), ''):
+                        yield chunk
+                finally:
+                    f.close()
+            return Channel(chunks(), pool, ahead)
+
+        def fullPath(_):
+            return rd.fullPath()
+
+        return cls.make(isDir, exists, subRdFiles, subRdFile,
+                        iterSubRdFiles, walk, getBytes, readChunks, fullPath,
+                        __div__=subRdFile,
+                        __trueDiv=subRdFile)
+
+
+class AsyncEditable(ESuite):
+    '''Eventual facade on an Editable.
+    '''
+    def __new__(cls, ed, pool):
+        _ro = AsyncReadable(ed.ro(), pool)
+
+        def wrap(sub):
+            return AsyncEditable(sub, pool)
+
+        def ro(_):
+            return _ro
+
+        def subEdFiles(_):
+            return spawn(pool, lambda: [wrap(s) for s in ed.subEdFiles()])
+
+        def subEdFile(_, n):
+            return wrap(ed.subEdFile(n))
+
+        def setBytes(_, b):
+            return spawn(pool, ed.setBytes, b)
+
+        def writeChunks(_):
+            return Writer(ed.outChannel, pool)
+
+        def mkDir(_):
+            return spawn(pool, ed.mkDir)
+
+        def delete(_):
+            return spawn(pool, ed.delete)
+
+        return cls.make(ro, subEdFiles, subEdFile, setBytes, writeChunks,
+                        mkDir, delete,
+                        __div__=subEdFile,
+                        __trueDiv=subEdFile)
@@ -0,0 +1,145 @@
+'''findindex -- persistent SQLite index for find queries on a Readable
+
+A `FindIndex` keeps the name, size, and modification time of each
+file under a `Readable` root in an SQLite database, so repeated
+searches need not walk the tree. `refresh` brings the index up to
+date, re-listing only directories that changed (see :mod:`rewalk`)
+and stat'ing the files in the others::
+
+  >>> import os, tempfile
+  >>> from sqlite3 import connect
+  >>> from lafile import Editable, relName_rd
+  >>> tmp = Editable(tempfile.mkdtemp(), os, open)
+  >>> tree = tmp / 'tree'
+  >>> tree.mkDir(); (tree / 'logs').mkDir()
+  >>> (tree / 'a.txt').setBytes('a'); (tree / 'b.csv').setBytes('b' * 100)
+  >>> (tree / 'logs' / 'c.txt').setBytes('c' * 10)
+
+  >>> index = FindIndex(tree.ro(), tmp / 'find.db', connect)
+  >>> index.refresh()
+  4
+
+Results are subordinates of the root, never bare paths::
+
+  >>> [relName_rd(rd, tree.ro()) for rd in index.find('*.txt')]
+  ['a.txt', 'logs/c.txt']
+  >>> [relName_rd(rd, tree.ro()) for rd in index.find(minSize=10)]
+  ['b.csv', 'logs/c.txt']
+  >>> [relName_rd(rd, tree.ro()) for rd in index.find(dirs=True)]
+  ['logs']
+
+The index outlives the process; a later refresh picks up only the
+changes::
+
+  >>> index.close()
+  >>> (tree / 'a.txt').delete()
+  >>> def touch(ed, t): os.utime(ed.ro().fullPath(), (t, t))
+  >>> touch(tree, 1)
+  >>> index = FindIndex(tree.ro(), tmp / 'find.db', connect)
+  >>> index.refresh()
+  1
+  >>> [relName_rd(rd, tree.ro()) for rd in index.find('*.txt')]
+  ['logs/c.txt']
+
+Files changed in place, such as logs, are found by size and time::
+
+  >>> (tree / 'logs' / 'c.txt').outChannel(append=True).write('c' * 1000)
+  >>> touch(tree / 'logs' / 'c.txt', 2000000000)
+  >>> index.refresh()
+  1
+  >>> [relName_rd(rd, tree.ro()) for rd in index.find(minSize=1000)]
+  ['logs/c.txt']
+  >>> [relName_rd(rd, tree.ro()) for rd in index.find(newerThan=1999999999)]
+  ['logs/c.txt']
+
+  >>> index.close(); tmp.deleteTree()
+'''
+
+from encap import ESuite
+from rewalk import diff_walk_rd, dumps, loads
+
+_SCHEMA = '''
+create table if not exists files (
+  rel text primary key,
+  name text not null,
+  isDir integer not null,
+  size integer,
+  mtime real
+);
+create index if not exists files_name on files (name);
+create index if not exists files_size on files (size);
+create index if not exists files_mtime on files (mtime);
+create table if not exists snapshot (
+  id integer primary key check (id = 0),
+  data blob not null
+);
+'''
+
+
+class FindIndex(ESuite):
+    '''Index of the files under `root`.
+
+    :param root: a `Readable` directory
+    :param dbEd: `Editable` for the SQLite database file
+    :param connect: e.g. `sqlite3.connect`
+    '''
+    def __new__(cls, root, dbEd, connect):
+        db = connect(dbEd.ro().fullPath())
+        db.text_factory = str  # names are byte strings
+        db.executescript(_SCHEMA)
+
+        def refresh(_):
+            '''Bring the index up to date with the tree.
+
+            :return: the number of entries added, removed, or modified
+            '''
+            row = db.execute('select data from snapshot').fetchone()
+            old = loads(str(row[0])) if row else {}
+            new = {}
+            changes = list(diff_walk_rd(root, old, new, restat=True))
+
+            gone, fresh = [], []
+            for change, rel in changes:
+                if change == 'removed':
+                    gone.append((rel,))
+                    continue
+                parent, _, name = rel.rpartition('/')
+                isDir, mtime, size = new[parent][1][name]
+                fresh.append((rel, name, isDir, size, mtime))
+            with db:
+                db.executemany('delete from files where rel = ?', gone)
+                db.executemany('insert or replace into files'
+                               ' values (?, ?, ?, ?, ?)', fresh)
+                db.execute('insert or replace into snapshot values (0, ?)',
+                           (buffer(dumps(new)),))
+            return len(changes)
+
+        def find(_, name=None, minSize=None, maxSize=None,
+                 newerThan=None, olderThan=None, dirs=False):
+            '''Find files (or, with `dirs`, directories) as of the last
+            `refresh`.
+
+            :param name: shell-style pattern for the last component
+                         of the name, matched as by `find -name`
+            :param minSize: in bytes, inclusive; likewise `maxSize`
+            :param newerThan: modification time, exclusive; likewise
+                              `olderThan`
+            :return: iterator of subordinates of `root`, in name order
+            '''
+            where, args = ['isDir = ?'], [1 if dirs else 0]
+            for test, arg in [('name glob ?', name),
+                              ('size >= ?', minSize),
+                              ('size <= ?', maxSize),
+                              ('mtime > ?', newerThan),
+                              ('mtime < ?', olderThan)]:
+                if arg is not None:
+                    where.append(test)
+                    args.append(arg)
+            rows = db.execute('select rel from files where %s order by rel'
+                              % ' and '.join(where), args)
+            return (root.subRdFile(rel) for (rel,) in rows)
+
+        def close(_):
+            db.close()
+
+        return cls.make(refresh, find, close)
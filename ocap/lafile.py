@@ -25,9 +25,13 @@ __ http://www.hpl.hp.com/techreports/2006/HPL-2006-116.html
 
 '''
 
-from ConfigParser import SafeConfigParser
+from itertools import islice
 
-from encap import ESuite
+from encap import ESuite, slot, val, update
+
+# ConfigParser, collections, threading, and the like are imported
+# where they are used, to keep `import lafile` cheap for scripts that
+# only read and write files.
 
 
 class Readable(ESuite):
@@ -59,43 +63,370 @@ class Readable(ESuite):
       ...
     LookupError: Path [/etc/passwd] not subordinate ...
 
+    Pass a `ChildCache` to share subordinates among traversals
+    that lead to the same place:
+
+    >>> kids = ChildCache()
+    >>> x = Readable('/x', os.path, os.listdir, open, kids)
+    >>> x / 'y' is x / 'y'
+    True
+    >>> x / 'y' / 'z' is x / 'y/./z'
+    True
+
+    Pass a `ContentCache` to keep the contents of recently read files.
+
+    For huge directories, `iterSubRdFiles` makes subordinates one at a
+    time, reading names `pageSize` at a time; pass `os.scandir` (or
+    `scandir.scandir`) as `os_listdir` to stream the names too, as
+    `Editable` does where `os.scandir` is available.
+
     '''
-    def __new__(cls, path0, os_path, os_listdir, openf):
+    def __new__(cls, path0, os_path, os_listdir, openf,
+                children=None, contents=None):
         path = os_path.abspath(path0)
+        powers = (os_path, os_listdir, openf, contents)
 
         def isDir(_):
             return os_path.isdir(path)
 
+        def isLink(_):
+            return os_path.islink(path)
+
         def exists(_):
             return os_path.exists(path)
 
         def subRdFiles(self):
-            return [self.subRdFile(n)
+            return [self.subRdFile(_entryName(n))
                     for n in os_listdir(path)]
 
+        def iterSubRdFiles(self, pageSize=1024):
+            for page in _paged(os_listdir(path), pageSize):
+                for n in page:
+                    yield self.subRdFile(_entryName(n))
+
         def subRdFile(_, n):
+            if children is not None:
+                it = children.get(path, n, powers)
+                if it is not None:
+                    return it
+
             there = os_path.normpath(os_path.join(path, n))
             if not there.startswith(path):
                 raise LookupError(
                     'Path [%s] not subordinate to [%s]' % (n, path))
 
-            return Readable(there, os_path, os_listdir, openf)
+            if children is None:
+                return Readable(there, os_path, os_listdir, openf,
+                                contents=contents)
+            hop = (os_path.dirname(there) == path and
+                   os_path.basename(there) == n)
+            return children.share(
+                path, n if hop else None, there, powers,
+                lambda: Readable(there, os_path, os_listdir, openf,
+                                 children, contents))
 
         def inChannel(_):
             return openf(path)
 
         def getBytes(_):
+            if contents is not None:
+                return contents.getBytes(path, lambda: openf(path).read())
             return openf(path).read()
 
         def fullPath(_):
-            return os_path.abspath(path)
+            return path
+
+        def lastModified(_):
+            return os_path.getmtime(path)
+
+        def length(_):
+            return os_path.getsize(path)
 
-        return cls.make(isDir, exists, subRdFiles, subRdFile, inChannel,
-                        getBytes, fullPath,
+        def describe(_):
+            return ('Readable', path)
+
+        return cls.make(isDir, isLink, exists, subRdFiles, iterSubRdFiles,
+                        subRdFile, inChannel,
+                        getBytes, fullPath, lastModified, length, describe,
                         __div__=subRdFile,
                         __trueDiv=subRdFile)
 
 
+class ChildCache(ESuite):
+    '''Memo of subordinate capabilities, shared across one tree.
+
+    Children are held weakly, keyed both by (parent path, name) and by
+    normalized path; the `maxsize` most recently used are also held
+    strongly so that hot paths survive between requests.
+
+    >>> import os
+    >>> kids = ChildCache(maxsize=2)
+    >>> root = Readable('/srv', os.path, os.listdir, open, kids)
+    >>> a = root / 'a'
+    >>> len(kids)
+    1
+    >>> b, c, d = root / 'b', root / 'c', root / 'd'
+    >>> del a, b, c, d
+    >>> len(kids)
+    2
+
+    Using one child over and over doesn't crowd out the others:
+    >>> for _ in range(5): c = root / 'c'
+    >>> len(kids)
+    2
+
+    Other names for a child find it by its path; only plain names are
+    remembered as hops, so there is one hop per child at most:
+    >>> (root / './c') is c is (root / 'c/.')
+    True
+
+    A cache serves one tree; its capabilities carry that tree's
+    powers, so another tree may not use it:
+    >>> Readable('/srv', os.path, os.listdir, lambda p: None, kids) / 'c'
+    Traceback (most recent call last):
+      ...
+    ValueError: ChildCache is shared by trees with different powers
+    '''
+    def __new__(cls, maxsize=256):
+        from collections import OrderedDict
+        from weakref import WeakValueDictionary
+
+        hops = WeakValueDictionary()
+        byPath = WeakValueDictionary()
+        recent = OrderedDict()  # id(child) -> child, least recent first
+        owner = slot(None)
+
+        def check(powers):
+            if powers != val(owner):
+                if val(owner) is not None:
+                    raise ValueError('ChildCache is shared by trees'
+                                     ' with different powers')
+                update(owner, powers)
+
+        def use(it):
+            k = id(it)
+            recent.pop(k, None)
+            recent[k] = it
+            if len(recent) > maxsize:
+                recent.popitem(last=False)
+
+        def get(_, parent, n, powers):
+            check(powers)
+            it = hops.get((parent, n))
+            if it is not None:
+                use(it)
+            return it
+
+        def share(_, parent, n, there, powers, mk):
+            '''Get the child at `there`, making it with `mk` if need be.
+
+            :param n: name of `there` under `parent`, to look it up by
+                      next time; None for names that aren't a single
+                      normal path segment.
+            '''
+            check(powers)
+            there = _intern(there)
+            it = byPath.get(there)
+            if it is None:
+                it = mk()
+                byPath[there] = it
+            if n is not None:
+                hops[(parent, _intern(n))] = it
+            use(it)
+            return it
+
+        def __len__(_):
+            return len(byPath)
+
+        return cls.make(get, share, __len__)
+
+
+def _intern(s):
+    return intern(s) if type(s) is str else s
+
+
+def _entryName(n):
+    return getattr(n, 'name', n)  # e.g. os.scandir entries
+
+
+def _paged(items, size):
+    it = iter(items)
+    while True:
+        page = list(islice(it, size))
+        if not page:
+            return
+        yield page
+
+
+class ContentCache(ESuite):
+    '''Bounded LRU cache of file contents, shared across a tree.
+
+    Entries are valid as long as the file's (mtime, size, inode) are
+    unchanged; writes through an `Editable` that shares the cache
+    drop the entry at once.
+
+    >>> import os, tempfile
+    >>> tmp = tempfile.mkdtemp()
+    >>> cache = ContentCache(os.stat, maxBytes=8)
+    >>> ed = Editable(tmp, os, open, cache)
+    >>> (ed / 'a').setBytes('hello')
+    >>> rd = ed.ro() / 'a'
+    >>> rd.getBytes(), rd.getBytes()
+    ('hello', 'hello')
+    >>> (ed / 'a').setBytes('world')
+    >>> rd.getBytes()
+    'world'
+
+    Least recently used entries go when `maxBytes` is exceeded:
+    >>> (ed / 'b').setBytes('12345')
+    >>> (ed.ro() / 'b').getBytes()
+    '12345'
+    >>> sorted(cache.stats().items())
+    ... # doctest: +NORMALIZE_WHITESPACE
+    [('bytesHeld', 5), ('entries', 1), ('hitRatio', 0.25), ('hits', 1),
+     ('maxBytes', 8), ('misses', 3)]
+
+    >>> for n in 'ab': (ed / n).delete()
+    >>> os.rmdir(tmp)
+    '''
+    def __new__(cls, os_stat, maxBytes=1 << 24):
+        from collections import OrderedDict
+        from threading import Lock
+
+        entries = OrderedDict()  # path -> (stamp, content)
+        lock = Lock()
+        held = [0]
+        counts = {'hits': 0, 'misses': 0}
+
+        def getBytes(_, path, read):
+            st = os_stat(path)
+            stamp = (st.st_mtime, st.st_size, st.st_ino)
+            with lock:
+                hit = entries.pop(path, None)
+                if hit is not None:
+                    if hit[0] == stamp:
+                        entries[path] = hit
+                        counts['hits'] += 1
+                        return hit[1]
+                    held[0] -= len(hit[1])
+                counts['misses'] += 1
+
+            content = read()
+            if len(content) > maxBytes:
+                return content
+
+            with lock:
+                old = entries.pop(path, None)
+                if old is not None:
+                    held[0] -= len(old[1])
+                entries[path] = (stamp, content)
+                held[0] += len(content)
+                while held[0] > maxBytes:
+                    _, (_, evicted) = entries.popitem(last=False)
+                    held[0] -= len(evicted)
+            return content
+
+        def invalidate(_, path):
+            with lock:
+                old = entries.pop(path, None)
+                if old is not None:
+                    held[0] -= len(old[1])
+
+        def stats(_):
+            with lock:
+                lookups = counts['hits'] + counts['misses']
+                return dict(counts,
+                            hitRatio=(float(counts['hits']) / lookups
+                                      if lookups else 0.0),
+                            bytesHeld=held[0],
+                            entries=len(entries),
+                            maxBytes=maxBytes)
+
+        return cls.make(getBytes, invalidate, stats)
+
+
+class PathTable(ESuite):
+    '''Indexed table of authorized pathnames.
+
+    Exact names are hashed; an entry ending in `/` grants every name
+    beneath it, indexed by component in a trie. Lookup is O(1) for
+    exact names and O(depth) for names under a directory grant.
+
+    >>> t = PathTable(['f1', '/tmp/f2', 'data/'])
+    >>> 'f1' in t, '/tmp/f2' in t
+    (True, True)
+    >>> 'data/2013/x.csv' in t
+    True
+
+    Names must match literally; no `.`, `..` or empty components
+    are accepted under a directory grant:
+    >>> './f1' in t, 'data/../etc/passwd' in t, 'data//x' in t
+    (False, False, False)
+
+    Iteration gives the entries in the order they were granted:
+    >>> list(t), len(t)
+    (['f1', '/tmp/f2', 'data/'], 3)
+
+    A table can be built from a manifest, one pathname per line;
+    blank lines and lines starting with `#` are ignored:
+    >>> from StringIO import StringIO
+    >>> import os
+    >>> manifest = Readable('', os.path, os.listdir,
+    ...                     lambda n: StringIO('# batch 7\\nf1\\n\\nlogs/\\n'))
+    >>> list(PathTable.fromRd(manifest))
+    ['f1', 'logs/']
+    '''
+    def __new__(cls, paths):
+        entries = []
+        exact = set()
+        trie = {}
+
+        for n in paths:
+            if n in exact:
+                continue
+            entries.append(n)
+            exact.add(n)
+            if n.endswith('/'):
+                node = trie
+                for c in n[:-1].split('/'):
+                    node = node.setdefault(c, {})
+                node[_GRANT_ALL] = True
+
+        def __contains__(_, n):
+            if n in exact:
+                return True
+            if not trie:
+                return False
+            steps = n.split('/')
+            if (steps[0] in ('.', '..') or
+                    [c for c in steps[1:] if c in ('', '.', '..')]):
+                return False
+            node = trie
+            for c in steps[:-1]:
+                node = node.get(c)
+                if node is None:
+                    return False
+                if _GRANT_ALL in node:
+                    return True
+            return False
+
+        def __iter__(_):
+            return iter(entries)
+
+        def __len__(_):
+            return len(entries)
+
+        return cls.make(__contains__, __iter__, __len__)
+
+    @classmethod
+    def fromRd(cls, rd):
+        return cls(n for n in (line.rstrip('\r\n') for line in rd.inChannel())
+                   if n and not n.startswith('#'))
+
+
+_GRANT_ALL = object()
+
+
 class ListReadable(ESuite):
     '''Simulate a readable directory using a list of pathnames.
 
@@ -104,7 +435,7 @@ class ListReadable(ESuite):
     >>> import os
     >>> fs = Readable('/', os.path, os.listdir, open)
 
-    @param paths: a list of authorized paths
+    @param paths: a list of authorized paths, or a `PathTable`
     @param base: base readable
     @param abspath: given a possibly relative authorized path,
                     return its full path.
@@ -133,10 +464,19 @@ class ListReadable(ESuite):
       ...
     IOError: not an authorized pathname: ./f1
 
+    An entry ending in `/` authorizes everything under it:
+    >>> var_dir = ListReadable(['/var/log/'], fs, os.path.abspath)
+    >>> var_dir.subRdFile('/var/log/syslog').fullPath()
+    '/var/log/syslog'
+    >>> var_dir.subRdFile('/var/log/../../etc/passwd')
+    Traceback (most recent call last):
+      ...
+    IOError: not an authorized pathname: /var/log/../../etc/passwd
+
     '''
 
     def __new__(cls, paths, base, abspath):
-        paths = paths[:]  # defensive copy, since python lacks immutable lists.
+        paths = PathTable(paths)  # defensive (and immutable) copy
 
         def isDir(_):
             return True
@@ -147,6 +487,9 @@ class ListReadable(ESuite):
         def subRdFiles(self):
             return [self.subRdFile(n) for n in paths]
 
+        def iterSubRdFiles(self, pageSize=None):
+            return (self.subRdFile(n) for n in paths)
+
         def subRdFile(self, n):
             if n not in paths:
                 raise IOError('not an authorized pathname: %s' % n)
@@ -161,23 +504,177 @@ class ListReadable(ESuite):
         def fullPath(_):
             return abspath('')
 
-        return cls.make(isDir, exists, subRdFiles, subRdFile, inChannel,
-                        getBytes, fullPath,
+        def describe(_):
+            return ('ListReadable', _resolved(paths, abspath), abspath(''),
+                    base.describe())
+
+        return cls.make(isDir, exists, subRdFiles, iterSubRdFiles,
+                        subRdFile, inChannel,
+                        getBytes, fullPath, describe,
                         __div__=subRdFile,
                         __trueDiv=subRdFile)
 
 
 class ConfigDir(object):
     @classmethod
-    def fromRd(cls, rd, base, defaults=None):
+    def fromRd(cls, rd, base, defaults=None, cache=None):
+        if cache is not None:
+            return cls(cache.parser(rd, defaults), base)
+        from ConfigParser import SafeConfigParser
         cp = SafeConfigParser(defaults)
         cp.readfp(rd.inChannel(), rd.fullPath())
         return cls(cp, base)
 
 
+class ConfigCache(ESuite):
+    '''Share parsed config files; re-read them only when they change.
+
+    >>> import os, tempfile
+    >>> tmp = tempfile.mkdtemp()
+    >>> ini = os.path.join(tmp, 'app.ini')
+    >>> open(ini, 'w').write('[db]\\nfile: /var/run/x.db\\n')
+    >>> ini_rd = Readable(ini, os.path, os.listdir, open)
+    >>> fs = Readable('/', os.path, os.listdir, open)
+
+    >>> configs = ConfigCache()
+    >>> config_dir = ConfigRd.fromRd(ini_rd, fs, cache=configs)
+    >>> configs.parser(ini_rd) is configs.parser(ini_rd)
+    True
+    >>> (config_dir / 'db' / 'file').fullPath()
+    '/var/run/x.db'
+
+    When the file changes, existing holders see the new values:
+    >>> open(ini, 'w').write('[db]\\nfile: /var/run/y.db\\n')
+    >>> (config_dir / 'db' / 'file').fullPath()
+    '/var/run/y.db'
+
+    >>> os.remove(ini); os.rmdir(tmp)
+    '''
+    def __new__(cls):
+        live = {}
+
+        def parser(_, rd, defaults=None):
+            key = (rd.fullPath(),
+                   tuple(sorted(defaults.items())) if defaults else ())
+            cp = live.get(key)
+            if cp is None:
+                cp = live[key] = LiveConfig(rd, defaults)
+            return cp
+
+        return cls.make(parser)
+
+
+class LiveConfig(ESuite):
+    '''Read-only ConfigParser look-alike that follows its source file.
+
+    The file is re-read only when its modification time or size
+    change, and then only split into sections; each section is parsed
+    the first time it is used. A file changed twice within one `tick`
+    of the filesystem's clock may keep the same modification time and
+    size, so one modified less than `tick` seconds before it was read
+    is read again next time.
+
+    >>> from StringIO import StringIO
+    >>> import os
+    >>> ini = """
+    ... [DEFAULT]
+    ... dir: /var/run
+    ... [sqlite_db]
+    ... file: %(dir)s/x.db
+    ... [huge]
+    ... junk = 1
+    ... """
+    >>> ini_rd = Readable('', os.path, os.listdir, lambda n: StringIO(ini))
+    >>> cp = LiveConfig(ini_rd)
+    >>> cp.sections()
+    ['sqlite_db', 'huge']
+    >>> cp.get('sqlite_db', 'file')
+    '/var/run/x.db'
+    >>> cp.get('oops', 'file')
+    Traceback (most recent call last):
+      ...
+    NoSectionError: No section: 'oops'
+    '''
+    def __new__(cls, rd, defaults=None, tick=1.0, clock=None):
+        if clock is None:
+            from time import time as clock
+        # (stamp, section names, DEFAULT text, section texts, parsed)
+        state = [None]
+
+        def current():
+            stamp = (rd.lastModified(), rd.length())
+            st = state[0]
+            if st is None or st[0] != stamp:
+                racy = stamp[0] > clock() - tick
+                st = state[0] = ((None if racy else stamp,) +
+                                 _splitSections(rd.inChannel()))
+            return st
+
+        def section(name):
+            _, names, dtext, texts, parsed = current()
+            cp = parsed.get(name)
+            if cp is None:
+                # imported here, off the path of sections already parsed
+                from ConfigParser import NoSectionError, SafeConfigParser
+                from StringIO import StringIO
+
+                if name not in texts:
+                    raise NoSectionError(name)
+                cp = SafeConfigParser(defaults)
+                cp.readfp(StringIO(dtext + texts[name]), rd.fullPath())
+                parsed[name] = cp
+            return cp
+
+        def sections(_):
+            return current()[1][:]
+
+        def has_section(_, name):
+            return name in current()[3]
+
+        def options(_, name):
+            return section(name).options(name)
+
+        def has_option(self, name, option):
+            return (has_section(self, name) and
+                    section(name).has_option(name, option))
+
+        def get(_, name, option, raw=False, vars=None):
+            return section(name).get(name, option, raw, vars)
+
+        def items(_, name, raw=False, vars=None):
+            return section(name).items(name, raw, vars)
+
+        return cls.make(sections, has_section, options, has_option,
+                        get, items)
+
+
+def _splitSections(lines):
+    '''Split config text into sections, without parsing them.
+    '''
+    from ConfigParser import SafeConfigParser
+
+    names, dtext, texts = [], [], {}
+    chunk = dtext
+    for line in lines:
+        mo = line[:1] == '[' and SafeConfigParser.SECTCRE.match(line)
+        if mo:
+            name = mo.group('header')
+            if name == 'DEFAULT':
+                chunk = dtext
+            elif name in texts:
+                chunk = texts[name]
+            else:
+                names.append(name)
+                chunk = texts[name] = []
+        chunk.append(line)
+    return (names, ''.join(dtext),
+            dict((n, ''.join(t)) for (n, t) in texts.items()), {})
+
+
 class ConfigRd(ESuite, ConfigDir):
     '''Treat config parameters as read authorization.
 
+    >>> from ConfigParser import SafeConfigParser
     >>> cp = SafeConfigParser()
     >>> cp.add_section('sqlite_db')
     >>> cp.set('sqlite_db', 'file', '/var/run/x.db')
@@ -215,9 +712,11 @@ class ConfigRd(ESuite, ConfigDir):
             return section is None or cp.has_section(section)
 
         def subRdFiles(self):
-            return ([self / s for s in cp.sections()]
-                    if section is None
-                    else [self / opt for opt in cp.options(section)])
+            return list(iterSubRdFiles(self))
+
+        def iterSubRdFiles(self, pageSize=None):
+            return (self / n for n in (cp.sections() if section is None
+                                       else cp.options(section)))
 
         def subRdFile(self, n):
             return (ConfigRd(cp, base, n) if section is None
@@ -232,9 +731,14 @@ class ConfigRd(ESuite, ConfigDir):
         def fullPath(_):
             return base.fullPath()
 
+        def describe(_):
+            return ('ConfigRd', _snapshot(cp, section), section,
+                    base.describe())
+
         return cls.make(get,
-                        isDir, exists, subRdFiles, subRdFile, inChannel,
-                        getBytes, fullPath,
+                        isDir, exists, subRdFiles, iterSubRdFiles,
+                        subRdFile, inChannel,
+                        getBytes, fullPath, describe,
                         __div__=subRdFile,
                         __trueDiv=subRdFile)
 
@@ -246,11 +750,55 @@ class Editable(ESuite):
     >>> (x / 'y').ro().fullPath()
     '/x/y'
 
+    Trees can be copied and deleted in bulk; file contents are copied
+    by the kernel where the platform allows:
+
+    >>> import tempfile
+    >>> tmp = Editable(tempfile.mkdtemp(), os, open)
+    >>> src, dest = tmp / 'src', tmp / 'dest'
+    >>> src.mkDir(); (src / 'sub').mkDir(); dest.mkDir()
+    >>> (src / 'a').setBytes('aaa'); (src / 'sub' / 'b').setBytes('bb')
+    >>> src.copyTreeTo(dest)
+    (2, 5)
+    >>> (dest / 'sub' / 'b').ro().getBytes()
+    'bb'
+
+    >>> from multiprocessing.pool import ThreadPool
+    >>> done = []
+    >>> tmp.deleteTree(ThreadPool(2), lambda n, size: done.append(n))
+    >>> sorted(done)
+    ['dest/a', 'dest/sub/b', 'src/a', 'src/sub/b']
+    >>> tmp.ro().exists()
+    False
+
+    Symbolic links are copied and deleted as links; bulk operations
+    never follow them out of the tree:
+
+    >>> tmp = Editable(tempfile.mkdtemp(), os, open)
+    >>> tree, outside, copy = tmp / 'tree', tmp / 'outside', tmp / 'copy'
+    >>> tree.mkDir(); outside.mkDir(); copy.mkDir()
+    >>> (outside / 'keep').setBytes('k')
+    >>> (tree / 'link').mkLink('../outside')
+    >>> tree.copyTreeTo(copy)
+    (1, 0)
+    >>> os.readlink((copy / 'link').ro().fullPath())
+    '../outside'
+    >>> tree.deleteTree(); copy.deleteTree()
+    >>> (outside / 'keep').ro().getBytes()
+    'k'
+    >>> tmp.deleteTree()
+
     '''
-    def __new__(cls, path, os, openf):
+    def __new__(cls, path, os, openf, contents=None):
+        listing = getattr(os, 'scandir', os.listdir)
+
         def _openrd(p):
             return openf(p, 'r')
-        _ro = Readable(path, os.path, os.listdir, _openrd)
+        _ro = Readable(path, os.path, listing, _openrd, contents=contents)
+
+        def _forget():
+            if contents is not None:
+                contents.invalidate(_ro.fullPath())
 
         def ro(_):
             return _ro
@@ -258,30 +806,77 @@ class Editable(ESuite):
         def subEdFiles(self):
             return [self.subEdFile(n) for n in os.listdir(path)]
 
+        def iterSubEdFiles(self, pageSize=1024):
+            for page in _paged(listing(path), pageSize):
+                for n in page:
+                    yield self.subEdFile(_entryName(n))
+
         def subEdFile(_, n):
             there = os.path.join(path, n)
             if not there.startswith(path):
                 raise LookupError('Path does not lead to a subordinate.')
 
-            return Editable(there, os, openf)
+            return Editable(there, os, openf, contents)
 
-        def outChannel(_):
-            return openf(path, 'w')
+        def outChannel(_, append=False):
+            _forget()
+            return openf(path, 'a' if append else 'w')
 
         def setBytes(self, b):
             outChannel(self).write(b)
+            _forget()
 
         def mkDir(_):
             os.mkdir(path)
 
+        def mkLink(_, target):
+            '''Make this a symbolic link to `target`, as given.
+            '''
+            os.symlink(target, path)
+
         def createNewFile(_):
             setBytes('')
 
         def delete(_):
-            os.remove(path)
-
-        return cls.make(ro, subEdFiles, subEdFile, outChannel,
-                        setBytes, mkDir, createNewFile, delete,
+            if os.path.isdir(path) and not os.path.islink(path):
+                os.rmdir(path)
+            else:
+                os.remove(path)
+            _forget()
+
+        def renameTo(_, dest):
+            '''Atomically replace `dest`, another Editable, with this file.
+            '''
+            _forget()
+            os.rename(path, dest.ro().fullPath())
+
+        def copyTreeTo(self, dest, pool=None, progress=None):
+            '''Copy this file, or the files and directories under it,
+            into `dest`.
+
+            :param pool: e.g. `multiprocessing.pool.ThreadPool`;
+                         files are copied in parallel on it.
+            :param progress: called with (relative name, size)
+                             as each file is done.
+            :return: (files, bytes) copied
+
+            Symbolic links are copied as links, with size 0.
+            '''
+            return _copyTree(self, dest, os, pool, progress)
+
+        def deleteTree(self, pool=None, progress=None):
+            '''Delete this file, or this directory and all under it.
+
+            Symbolic links are removed, not followed.
+            '''
+            _deleteTree(self, pool, progress)
+
+        def describe(_):
+            return ('Editable', _ro.fullPath())
+
+        return cls.make(ro, subEdFiles, iterSubEdFiles, subEdFile,
+                        outChannel, setBytes, mkDir, mkLink, createNewFile,
+                        delete, renameTo, copyTreeTo, deleteTree, describe,
                         __div__=subEdFile,
                         __trueDiv=subEdFile)
 
@@ -290,6 +885,7 @@ class ListEditable(ESuite):
     '''a la ListReadable
     '''
     def __new__(cls, paths, base, abspath):
+        paths = PathTable(paths)
         _ro = ListReadable(paths, base.ro(), abspath)
 
         def ro(_):
@@ -298,6 +894,9 @@ class ListEditable(ESuite):
         def subEdFiles(self):
             return [self.subEdFile(n) for n in paths]
 
+        def iterSubEdFiles(self, pageSize=None):
+            return (self.subEdFile(n) for n in paths)
+
         def subEdFile(_, n):
             if n not in paths:
                 raise IOError('not an authorized pathname: %s' % n)
@@ -318,8 +917,13 @@ class ListEditable(ESuite):
         def delete(_):
             raise IOError('cannot delete list directory')
 
-        return cls.make(ro, subEdFiles, subEdFile, outChannel,
-                        setBytes, mkDir, createNewFile, delete,
+        def describe(_):
+            return ('ListEditable', _resolved(paths, abspath), abspath(''),
+                    base.describe())
+
+        return cls.make(ro, subEdFiles, iterSubEdFiles, subEdFile,
+                        outChannel,
+                        setBytes, mkDir, createNewFile, delete, describe,
                         __div__=subEdFile,
                         __trueDiv=subEdFile)
 
@@ -362,9 +966,11 @@ class ConfigEd(ESuite, ConfigDir):
             return ConfigRd(cp, base.ro(), section)
 
         def subEdFiles(self):
-            return ([self / s for s in cp.sections()]
-                    if section is None
-                    else [self / opt for opt in cp.options(section)])
+            return list(iterSubEdFiles(self))
+
+        def iterSubEdFiles(self, pageSize=None):
+            return (self / n for n in (cp.sections() if section is None
+                                       else cp.options(section)))
 
         def subEdFile(self, n):
             return (ConfigEd(cp, base, n) if section is None
@@ -385,40 +991,400 @@ class ConfigEd(ESuite, ConfigDir):
         def delete(_):
             raise IOError('cannot delete config directory')
 
-        return cls.make(ro, subEdFiles, subEdFile, outChannel,
-                        setBytes, mkDir, createNewFile, delete,
+        def describe(_):
+            return ('ConfigEd', _snapshot(cp, section), section,
+                    base.describe())
+
+        return cls.make(ro, subEdFiles, iterSubEdFiles, subEdFile,
+                        outChannel,
+                        setBytes, mkDir, createNewFile, delete, describe,
                         __div__=subEdFile,
                         __trueDiv=subEdFile)
 
 
-def walk_ed(top):
+def rebuild(desc, os, openf):
+    '''Make a capability from a descriptor, as from `describe()`.
+
+    Descriptors are made of tuples and strings, so they can be
+    pickled and sent to another process, which rebuilds the
+    capability with its own `os` and `open`::
+
+    >>> import os, pickle
+    >>> fs = Readable('/', os.path, os.listdir, open)
+    >>> arg_dir = ListReadable(['f1', '/tmp/'], fs, os.path.abspath)
+    >>> desc = pickle.loads(pickle.dumps(arg_dir.describe()))
+    >>> desc[0], desc[1][1]
+    ('ListReadable', ('/tmp/', '/tmp'))
+    >>> there = rebuild(desc, os, open)
+    >>> there.subRdFile('/tmp/x').fullPath()
+    '/tmp/x'
+
+    A rebuilt capability conveys just the authority of the original::
+
+    >>> there.subRdFile('/etc/passwd')
+    Traceback (most recent call last):
+      ...
+    IOError: not an authorized pathname: /etc/passwd
+
+    Each name goes where the original's `abspath` sent it, as
+    recorded in the descriptor; names under a directory grant go
+    under where the grant itself went::
+
+    >>> jail = lambda n: os.path.join('/srv/jail', os.path.basename(n))
+    >>> jailed = ListReadable(['/etc/passwd', 'logs/'], fs, jail)
+    >>> there = rebuild(jailed.describe(), os, open)
+    >>> there.subRdFile('/etc/passwd').fullPath()
+    '/srv/jail/passwd'
+    >>> there.subRdFile('logs/2013/x').fullPath()
+    '/srv/jail/2013/x'
+
+    Caches are not carried over. Config files are read once, when
+    described; the rebuilt `ConfigRd` or `ConfigEd` has a snapshot of
+    the values (with interpolation done) in just the sections it
+    grants::
+
+    >>> from ConfigParser import SafeConfigParser
+    >>> cp = SafeConfigParser({'dir': '/var/run'})
+    >>> cp.add_section('sqlite_db')
+    >>> cp.set('sqlite_db', 'file', '%(dir)s/x.db')
+    >>> cp.add_section('secrets')
+    >>> cp.set('secrets', 'key', '/etc/key')
+    >>> db = ConfigEd(cp, Editable('/', os, open)) / 'sqlite_db'
+    >>> there = rebuild(pickle.loads(pickle.dumps(db.describe())), os, open)
+    >>> (there / 'file').ro().fullPath()
+    '/var/run/x.db'
+    >>> there.ro().subRdFiles()
+    [Readable(...), Readable(...)]
+    >>> [section for section, _ in db.describe()[1]]
+    ['sqlite_db']
+
+    >>> rebuild(('Socket', 'localhost'), os, open)
+    Traceback (most recent call last):
+      ...
+    ValueError: unknown capability descriptor: 'Socket'
+    '''
+    kind = desc[0]
+    if kind == 'Readable':
+        return Readable(desc[1], os.path, os.listdir, openf)
+    if kind == 'Editable':
+        return Editable(desc[1], os, openf)
+    if kind in ('ListReadable', 'ListEditable'):
+        _, resolved, root, baseDesc = desc
+        list_class = ListReadable if kind == 'ListReadable' else ListEditable
+        return list_class([n for (n, _) in resolved],
+                          rebuild(baseDesc, os, openf),
+                          _resolver(resolved, root, os.path))
+    if kind in ('ConfigRd', 'ConfigEd'):
+        from ConfigParser import RawConfigParser
+        _, snapshot, section, baseDesc = desc
+        cp = RawConfigParser()
+        for s, options in snapshot:
+            cp.add_section(s)
+            for k, v in options:
+                cp.set(s, k, v)
+        config_class = ConfigRd if kind == 'ConfigRd' else ConfigEd
+        return config_class(cp, rebuild(baseDesc, os, openf), section)
+    raise ValueError('unknown capability descriptor: %r' % (kind,))
+
+
+def _resolved(paths, abspath):
+    '''(name, full path) for each entry of `paths`, per `abspath`.
+    '''
+    return tuple((n, abspath(n)) for n in paths)
+
+
+def _resolver(resolved, root, os_path):
+    '''Rebuild an `abspath` from `_resolved` pairs.
+
+    A name under a directory grant goes under the grant's full path;
+    `PathTable` has already refused `.` and `..` in the rest of it.
+    '''
+    exact = dict(resolved)
+    grants = sorted(((n, there) for (n, there) in resolved
+                     if n.endswith('/')), key=lambda g: -len(g[0]))
+
+    def abspath(n):
+        if n == '':
+            return root
+        there = exact.get(n)
+        if there is not None:
+            return there
+        for g, gthere in grants:
+            if n.startswith(g):
+                return os_path.join(gthere, n[len(g):])
+        raise IOError('not an authorized pathname: %s' % n)
+    return abspath
+
+
+def _snapshot(cp, section):
+    '''Resolved option values of `section`, or of all sections.
+    '''
+    if section is not None and not cp.has_section(section):
+        return ()
+    return tuple((s, tuple((k, cp.get(s, k)) for k in cp.options(s)))
+                 for s in ([section] if section is not None
+                           else cp.sections()))
+
+
+def walk_ed(top, lazy=False, pool=None, maxPending=16, maxSeen=None,
+            onerror=None, pageSize=None):
     '''ocap analog to os.walk for editables
+
+    With `lazy`, list directories with `iterSubEdFiles`.
+    With `pool` or `pageSize`, walk as `walk_rd` does.
     '''
-    for x in _walk(top, lambda ed: ed.subEdFiles(),
-                   ro=lambda ed: ed.ro()):
+    for x in _walk(top, (lambda ed: ed.iterSubEdFiles()) if lazy
+                   else (lambda ed: ed.subEdFiles()),
+                   lambda ed: ed.ro(), pool, maxPending, maxSeen, onerror,
+                   pageSize):
         yield x
 
 
-def walk_rd(top):
+def walk_rd(top, lazy=False, pool=None, maxPending=16, maxSeen=None,
+            onerror=None, pageSize=None):
     '''ocap analog to os.walk
+
+    With `lazy`, list directories with `iterSubRdFiles`. Still, each
+    directory is reported with lists of all its entries, unless
+    `pageSize` is given; then it is reported in pieces of at most
+    that many entries, each piece followed by its subdirectories::
+
+    >>> import os
+    >>> here = Readable(os.path.dirname(__file__) or '.',
+    ...                 os.path, os.listdir, open)
+    >>> ([len(fs) for _, _, fs in walk_rd(here)] ==
+    ...  [len(fs) for _, _, fs in walk_rd(here, lazy=True)])
+    True
+    >>> pieces = [len(ds) + len(fs) for top, ds, fs in
+    ...           walk_rd(here, lazy=True, pageSize=4) if top is here]
+    >>> max(pieces) <= 4, sum(pieces) == len(here.subRdFiles())
+    (True, True)
+
+    A directory that can't be listed raises an exception, unless
+    `onerror` is given; then it is called with the exception, and the
+    walk goes on without that directory.
+
+    With a `pool` of threads, up to `maxPending` directories are
+    listed at once, each in full (`pageSize` is not supported), and
+    results come in no particular order. An entry reached by more
+    than one path is reported only once. Since each entry seen is
+    remembered, `maxSeen` sets a limit, past which the walk stops
+    with an exception rather than report a partial tree::
+
+    >>> from multiprocessing.pool import ThreadPool
+    >>> pool = ThreadPool(4)
+    >>> (sorted(len(fs) for _, _, fs in walk_rd(here)) ==
+    ...  sorted(len(fs) for _, _, fs in walk_rd(here, pool=pool)))
+    True
+    >>> list(walk_rd(here, pool=pool, maxSeen=3))
+    Traceback (most recent call last):
+      ...
+    RuntimeError: walk saw more than 3 entries; see maxSeen
+
+    >>> errors = []
+    >>> list(walk_rd(here / 'nowhere', pool=pool, onerror=errors.append))
+    []
+    >>> errors
+    [OSError(2, 'No such file or directory')]
+    >>> pool.close()
     '''
-    for x in _walk(top, lambda rd: rd.subRdFiles()):
+    for x in _walk(top, (lambda rd: rd.iterSubRdFiles()) if lazy
+                   else (lambda rd: rd.subRdFiles()),
+                   lambda rd: rd, pool, maxPending, maxSeen, onerror,
+                   pageSize):
         yield x
 
 
-def _walk(top, sub_files, ro=lambda rd: rd):
-    '''ocap analog to os.walk
-    '''
-    subs = [(sub, ro(sub).isDir())
-            for sub in sub_files(top)]
-    dirs = [s for (s, d) in subs if d]
-    nondirs = [s for (s, d) in subs if not d]
+def _walk(top, sub_files, ro, pool=None, maxPending=16, maxSeen=None,
+          onerror=None, pageSize=None):
+    if pool is not None:
+        if pageSize is not None:
+            raise ValueError('pageSize is not supported with pool')
+        return _pwalk(top, sub_files, ro, pool, maxPending, maxSeen,
+                      onerror)
+    return _swalk(top, sub_files, ro, onerror=onerror, pageSize=pageSize)
 
-    yield top, dirs, nondirs
 
-    for subd in dirs:
-        for x in _walk(subd, sub_files, ro):
-            yield x
+def _swalk(top, sub_files, ro, follow=True, onerror=None, pageSize=None):
+    '''ocap analog to os.walk
+
+    Unless `follow`, links to directories are listed with the files
+    rather than walked into. With `pageSize`, `top` is reported in
+    pieces, as `walk_rd` explains.
+    '''
+    first = True
+    while True:
+        dirs, nondirs = [], []
+        try:
+            if first:
+                subs = sub_files(top)
+                pages = (iter([subs]) if pageSize is None
+                         else _paged(subs, pageSize))
+            page = next(pages, None)
+            if page is None:
+                if not first:
+                    return
+                page = []
+            for sub in page:
+                rd = ro(sub)
+                (dirs if rd.isDir() and (follow or not rd.isLink())
+                 else nondirs).append(sub)
+        except Exception as ex:
+            if onerror is None:
+                raise
+            onerror(ex)
+            return
+        first = False
+
+        yield top, dirs, nondirs
+
+        for subd in dirs:
+            for x in _swalk(subd, sub_files, ro, follow, onerror, pageSize):
+                yield x
+
+
+def _subEdFiles(ed):
+    return ed.subEdFiles()
+
+
+def _ro(ed):
+    return ed.ro()
+
+
+def _pwalk(top, sub_files, ro, pool, maxPending, maxSeen, onerror):
+    '''Parallel, de-duplicating `_walk`, depth first to keep the
+    frontier small: it holds an iterator over the subdirectories at
+    each level being walked, plus `maxPending` listings.
+    '''
+    def listing(d):
+        try:
+            return d, [(s, ro(s).isDir()) for s in sub_files(d)], None
+        except Exception as ex:
+            return d, None, ex
+
+    from Queue import Queue
+
+    done = Queue()
+    seen = set([ro(top).fullPath()])
+    todo = [iter([top])]
+    pending = 0
+    while todo or pending:
+        while todo and pending < maxPending:
+            d = next(todo[-1], None)
+            if d is None:
+                todo.pop()
+                continue
+            pool.apply_async(listing, (d,), callback=done.put)
+            pending += 1
+        if not pending:
+            break
+        d, subs, err = done.get()
+        pending -= 1
+        if err is not None:
+            if onerror is None:
+                raise err
+            onerror(err)
+            continue
+
+        dirs, nondirs = [], []
+        for s, isDir in subs:
+            key = ro(s).fullPath()
+            if key in seen:
+                continue
+            if maxSeen is not None and len(seen) >= maxSeen:
+                raise RuntimeError('walk saw more than %d entries;'
+                                   ' see maxSeen' % maxSeen)
+            seen.add(key)
+            (dirs if isDir else nondirs).append(s)
+
+        yield d, dirs, nondirs
+        if dirs:
+            todo.append(iter(dirs))
+
+
+def _copyTree(src, dest, os, pool, progress):
+    def jobs():
+        if not src.ro().isDir() or src.ro().isLink():
+            yield '', src, dest
+            return
+        for top, dirs, files in _swalk(src, _subEdFiles, _ro, follow=False):
+            there = dest if top is src else dest.subEdFile(relName(top, src))
+            for d in dirs:
+                sub = there.subEdFile(relName(d, top))
+                if not sub.ro().isDir():
+                    sub.mkDir()
+            for f in files:
+                yield relName(f, src), f, there.subEdFile(relName(f, top))
+
+    def copy(job):
+        n, f, to = job
+        if f.ro().isLink():
+            to.mkLink(os.readlink(f.ro().fullPath()))
+            return n, 0
+        return n, _copyFile(f.ro().inChannel(), to.outChannel(), os)
+
+    files = total = 0
+    for n, size in _pmap(pool, copy, jobs()):
+        files += 1
+        total += size
+        if progress:
+            progress(n, size)
+    return files, total
+
+
+def _deleteTree(top, pool, progress):
+    if not top.ro().isDir() or top.ro().isLink():
+        top.delete()
+        return
+
+    dirs = []
+
+    def files():
+        for d, _, nondirs in _swalk(top, _subEdFiles, _ro, follow=False):
+            dirs.append(d)
+            for f in nondirs:
+                yield f
+
+    def rm(f):
+        size = 0 if f.ro().isLink() else f.ro().length()
+        f.delete()
+        return relName(f, top), size
+
+    for n, size in _pmap(pool, rm, files()):
+        if progress:
+            progress(n, size)
+    for d in reversed(dirs):
+        d.delete()
+
+
+def _pmap(pool, f, items):
+    return (pool.imap_unordered(f, items) if pool is not None
+            else (f(x) for x in items))
+
+
+def _copyFile(fin, fout, os, chunk=1 << 20):
+    '''Copy between open files; let the kernel do it if it can.
+    '''
+    copy_file_range = getattr(os, 'copy_file_range', None)
+    sendfile = getattr(os, 'sendfile', None)
+    total = 0
+    try:
+        if copy_file_range or sendfile:
+            src, dst = fin.fileno(), fout.fileno()
+            while True:
+                n = (copy_file_range(src, dst, chunk) if copy_file_range
+                     else sendfile(dst, src, total, chunk))
+                if not n:
+                    break
+                total += n
+        else:
+            for buf in iter(lambda: fin.read(chunk), ''):
+                fout.write(buf)
+                total += len(buf)
+    finally:
+        fin.close()
+        fout.close()
+    return total
 
 
 def relName(ed, anc):
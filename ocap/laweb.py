@@ -2,10 +2,13 @@
 
 '''
 
-from urlparse import urljoin
+import time
 
 from encap import ESuite
 
+# urlparse, HTMLParser, threading, and the like are imported where
+# they are used, to keep `import laweb` cheap.
+
 
 class WebReadable(ESuite):
     '''Read-only wrapping of urllib2 in the Emily/E least-authority API.
@@ -13,14 +16,15 @@ class WebReadable(ESuite):
     :param base: base URL
     :param urlopener: as from `urllib2.build_opener()`
     :param RequestClass: e.g. `urllib2.Request`
+    :param crawl: treat directory-style URLs (ending in `/`) as
+                  directories whose entries are the links, in the
+                  HTML they serve, that point "downward"
 
     >>> urlopener = _MockMostPagesOKButSome404('Z')
     >>> from urllib2 import Request
     >>> rdweb = WebReadable('http://example/stuff/', urlopener, Request)
 
-    A refinement could fetch content, parse links,
-    and enumerate those that point "downward", but
-    this implementation doesn't supply directory functionality::
+    By default, there is no directory functionality::
 
     >>> rdweb.isDir()
     False
@@ -54,14 +58,68 @@ class WebReadable(ESuite):
        ...
     LookupError: Path does not lead to a subordinate.
 
+    Nor are `.` and `..` segments that `urljoin` leaves in place, which
+    a server would take to lead elsewhere::
+    >>> rdweb.subRdFile('/stuff/../secret')
+    Traceback (most recent call last):
+       ...
+    LookupError: Path does not lead to a subordinate.
+
+    Fetch many subordinates concurrently on a pool of threads; each
+    path is checked just as by `subRdFile`, before anything is fetched::
+    >>> from multiprocessing.pool import ThreadPool
+    >>> pool = ThreadPool(4)
+    >>> for path, content, err in rdweb.fetchMany(['a', 'Z', 'b/c'], pool,
+    ...                                           retries=0):
+    ...     print('%s %r %s' % (path, content, err))
+    a 'page content...' None
+    Z None 404...
+    b/c 'page content...' None
+    >>> rdweb.fetchMany(['a', '../secrets'], pool)
+    Traceback (most recent call last):
+       ...
+    LookupError: Path does not lead to a subordinate.
+
+    Protocol errors are transient too; they are retried, and then
+    reported like any other::
+
+    >>> garbled = WebReadable('http://example/',
+    ...                       _MockMostPagesOKButSome404('', broken='X'),
+    ...                       Request)
+    >>> for path, content, err in garbled.fetchMany(['X', 'a'], pool,
+    ...                                             sleep=lambda s: None):
+    ...     print('%s %r %r' % (path, content, err))
+    X None BadStatusLine("''",)
+    a 'page content...' None
+    >>> pool.close()
+
+    In `crawl` mode, pages are parsed as they stream in, and links
+    are yielded as they are found; `walk_rd` can then traverse a site::
+
+    >>> from ocap.lafile import walk_rd
+    >>> from ocap.webpool import _serveLocal, _Site
+    >>> server, top = _serveLocal(_Site)
+    >>> from urllib2 import build_opener
+    >>> site = WebReadable(top, build_opener(), Request, crawl=True)
+    >>> [s.fullPath()[len(top):] for s in site.subRdFiles()]
+    ['a.txt', 'docs/']
+    >>> docs = site.subRdFile('docs/')
+    >>> [s.fullPath()[len(top):] for s in docs.subRdFiles()]
+    ['docs/b.txt', 'docs/c.txt']
+    >>> pool = ThreadPool(4)
+    >>> sorted(f.fullPath()[len(top):]
+    ...        for _, _, fs in walk_rd(site, pool=pool) for f in fs)
+    ['a.txt', 'docs/b.txt', 'docs/c.txt']
+    >>> pool.close(); server.shutdown()
+
     .. todo:: consider taking a hint/name parameter for printing.
     '''
 
-    def __new__(cls, base, urlopener, RequestClass):
+    def __new__(cls, base, urlopener, RequestClass, crawl=False):
         assert hasattr(urlopener, 'open'), "oops! bad urlopener"
 
         def isDir(_):
-            return False
+            return crawl and base.endswith('/')
 
         def exists(_):
             class HeadRequest(RequestClass):
@@ -79,20 +137,61 @@ class WebReadable(ESuite):
             except IOError:
                 return False
 
-        def subRdFiles(_):
-            return ()
+        def subRdFiles(self):
+            return list(iterSubRdFiles(self))
+
+        def iterSubRdFiles(_, pageSize=1 << 13):
+            '''Links to subordinates, found as the page streams in.
+
+            :param pageSize: bytes to read and parse at a time
+            '''
+            if not isDir(_):
+                return
+            from HTMLParser import HTMLParseError
+            from urlparse import urldefrag, urljoin
+
+            resp = urlopener.open(base)
+            try:
+                info = getattr(resp, 'info', lambda: None)()
+                ctype = info and info.getheader('Content-Type')
+                if ctype and ctype.split(';')[0].strip() != 'text/html':
+                    return
+                parser = _LinkParser()
+                seen = set([base])
+                for chunk in iter(lambda: resp.read(pageSize), ''):
+                    try:
+                        parser.feed(chunk)
+                    except HTMLParseError:
+                        break
+                    for href in parser.take():
+                        there = urldefrag(urljoin(base, href))[0]
+                        if _leadsDown(base, there) and there not in seen:
+                            seen.add(there)
+                            yield WebReadable(there, urlopener,
+                                              RequestClass, crawl)
+            finally:
+                resp.close()
 
         def subRdFile(_, path):
-            there = urljoin(base, path)
-            if not there.startswith(base):
+            there = _urljoin(base, path)
+            if not _leadsDown(base, there):
                 raise LookupError('Path does not lead to a subordinate.')
-            return WebReadable(there, urlopener, RequestClass)
+            return WebReadable(there, urlopener, RequestClass, crawl)
 
-        def inChannel(_):
+        def inChannel(_, start=None, ifRange=None):
             '''
+            :param start: ask for content from this offset on
+            :param ifRange: ETag or Last-Modified value; unless it
+                            still matches, the whole content is sent.
+
             .. todo:: wrap result of open() for strict confinement.
             '''
-            return urlopener.open(base)
+            if not start:
+                return urlopener.open(base)
+            headers = {'Range': 'bytes=%d-' % start}
+            if ifRange:
+                headers['If-Range'] = ifRange
+            return urlopener.open(RequestClass(base, None, headers))
 
         def getBytes(self):
             return inChannel(self).read()
@@ -100,8 +199,73 @@ class WebReadable(ESuite):
         def fullPath(_):
             return base
 
-        return cls.make(isDir, exists, subRdFiles, subRdFile, inChannel,
-                        getBytes, fullPath)
+        def fetchMany(self, paths, pool, perHost=4, retries=2,
+                      ordered=True, backoff=0.5, sleep=time.sleep):
+            '''Get the content of many subordinates at once.
+
+            :param pool: e.g. `multiprocessing.pool.ThreadPool`
+            :param perHost: most requests in flight to any one host
+            :param retries: times to retry a transient failure
+                            (an error other than a 4xx response)
+            :param ordered: deliver results in the order of `paths`,
+                            rather than as they complete
+            :return: iterator of (path, content, error), where
+                     exactly one of `content` and `error` is None
+            '''
+            subs = [(path, subRdFile(self, path)) for path in paths]
+            return _fetchMany(subs, pool, perHost, retries, ordered,
+                              backoff, sleep)
+
+        def describe(_):
+            return ('WebReadable', base, crawl)
+
+        return cls.make(isDir, exists, subRdFiles, iterSubRdFiles,
+                        subRdFile, inChannel, getBytes, fullPath,
+                        fetchMany, describe)
+
+
+def _leadsDown(base, there):
+    '''Is the URL `there` under `base`, with no `.` or `..` segment
+    (perhaps %-encoded) that might lead a server back up?
+    '''
+    if not there.startswith(base):
+        return False
+    rest = there[len(base):].split('?', 1)[0].split('#', 1)[0]
+    return not [seg for seg in rest.replace('\\', '/').split('/')
+                if seg.lower().replace('%2e', '.') in ('.', '..')]
+
+
+def _fetchMany(subs, pool, perHost, retries, ordered, backoff, sleep):
+    from httplib import HTTPException
+    from threading import BoundedSemaphore, Lock
+    from urlparse import urlsplit
+
+    hosts = {}
+    lock = Lock()
+
+    def limit(url):
+        host = urlsplit(url).netloc
+        with lock:
+            if host not in hosts:
+                hosts[host] = BoundedSemaphore(perHost)
+            return hosts[host]
+
+    def fetch(job):
+        path, sub = job
+        slot = limit(sub.fullPath())
+        for attempt in range(retries + 1):
+            if attempt:
+                sleep(backoff * 2 ** (attempt - 1))
+            with slot:
+                try:
+                    return path, sub.getBytes(), None
+                except (IOError, HTTPException) as ex:
+                    code = getattr(ex, 'code', None)
+                    if (attempt == retries or
+                            (code is not None and 400 <= code < 500)):
+                        return path, None, ex
+
+    return (pool.imap if ordered else pool.imap_unordered)(fetch, subs)
 
 
 class WebPostable(ESuite):
@@ -125,17 +289,453 @@ class WebPostable(ESuite):
         def post(_, content):
             return urlopener.open(base, content)
 
-        return cls.make(post, delegate=delegate)
+        def bulkPoster(_, pool, **kwargs):
+            '''Make a `BulkPoster` for `base`; see there for `kwargs`.
+            '''
+            return BulkPoster(base, urlopener, RequestClass, pool, **kwargs)
+
+        def describe(_):
+            return ('WebPostable', base)
+
+        return cls.make(post, bulkPoster, describe, delegate=delegate)
+
+
+def rebuild(desc, urlopener, RequestClass):
+    '''Make a capability from a descriptor, as from `describe()`,
+    with this process's `urlopener`; cf. `lafile.rebuild`.
+
+    >>> import pickle
+    >>> from urllib2 import Request
+    >>> urlopener = _MockMostPagesOKButSome404('Z')
+    >>> rdweb = WebReadable('http://example/stuff/', urlopener, Request)
+    >>> desc = pickle.dumps(rdweb.subRdFile('a/').describe())
+    >>> there = rebuild(pickle.loads(desc), urlopener, Request)
+    >>> there.fullPath()
+    'http://example/stuff/a/'
+    >>> there.subRdFile('../b')
+    Traceback (most recent call last):
+       ...
+    LookupError: Path does not lead to a subordinate.
+
+    Read-only capabilities stay read-only::
+
+    >>> doweb = WebPostable('http://example/stuff/', urlopener, Request)
+    >>> there = rebuild(doweb.subRdFile('rd').describe(), urlopener,
+    ...                 Request)
+    >>> there.post
+    Traceback (most recent call last):
+       ...
+    AttributeError: 'WebReadable' object has no attribute 'post'
+    >>> rebuild(doweb.describe(), urlopener, Request).post('x').read()
+    'you posted: x'
+    '''
+    kind = desc[0]
+    if kind == 'WebReadable':
+        return WebReadable(desc[1], urlopener, RequestClass, desc[2])
+    if kind == 'WebPostable':
+        return WebPostable(desc[1], urlopener, RequestClass)
+    raise ValueError('unknown capability descriptor: %r' % (kind,))
+
+
+class BulkPoster(ESuite):
+    '''Accumulate items and POST them to `base` in batches.
+
+    A batch is one request whose body holds an item per line, gzip
+    compressed as items are added; the response holds a result line
+    for each item, in the same order. Each item gets a promise (see
+    :mod:`eventual`) for its result. A batch is sent once it holds
+    `maxItems` items or `maxBytes` bytes, or `maxDelay` seconds after
+    its first item, whichever comes first. Batches are sent on `pool`,
+    so several may be in flight at once; with an opener from
+    :mod:`webpool`, they share keep-alive connections::
+
+    >>> from multiprocessing.pool import ThreadPool
+    >>> from urllib2 import Request
+    >>> from ocap.webpool import (ConnectionPool, build_pooled_opener,
+    ...                      _serveLocal, _Ingest)
+    >>> server, base = _serveLocal(_Ingest)
+    >>> conns, pool = ConnectionPool(), ThreadPool(2)
+    >>> doweb = WebPostable(base, build_pooled_opener(conns), Request)
+    >>> bulk = doweb.bulkPoster(pool, maxItems=3, maxDelay=None)
+    >>> results = [bulk.post('event %d' % n) for n in range(4)]
+    >>> bulk.flush().get(5)
+    1
+    >>> [p.get(5) for p in results]
+    ... # doctest: +NORMALIZE_WHITESPACE
+    ['received: event 0', 'received: event 1', 'received: event 2',
+     'received: event 3']
+    >>> bulk.stats()['batches']
+    2
+
+    With `maxDelay`, a lone item doesn't wait long::
+
+    >>> timed = doweb.bulkPoster(pool, maxDelay=0.01)
+    >>> timed.post('late').get(5)
+    'received: late'
+
+    If a batch fails, so does each of its items::
+
+    >>> lost = BulkPoster(base + 'missing', build_pooled_opener(conns),
+    ...                   Request, pool, maxDelay=None)
+    >>> p = lost.post('event')
+    >>> lost.flush().get(5)
+    Traceback (most recent call last):
+       ...
+    HTTPError: HTTP Error 404: Not Found
+    >>> p.get(5)
+    Traceback (most recent call last):
+       ...
+    HTTPError: HTTP Error 404: Not Found
+
+    Likewise for any other error from the opener::
+
+    >>> garbled = BulkPoster('http://example/X',
+    ...                      _MockMostPagesOKButSome404('', broken='X'),
+    ...                      Request, pool, maxDelay=None)
+    >>> p = garbled.post('event')
+    >>> garbled.flush().get(5)
+    Traceback (most recent call last):
+       ...
+    BadStatusLine: ''
+    >>> p.get(5)
+    Traceback (most recent call last):
+       ...
+    BadStatusLine: ''
+
+    Results are matched to items by position, so a response with too
+    few or too many lines fails every item in the batch::
+
+    >>> from StringIO import StringIO
+    >>> class Terse(object):
+    ...     def open(self, request):
+    ...         return StringIO('one result\\n')
+    >>> terse = BulkPoster('http://example/', Terse(), Request, pool,
+    ...                    maxDelay=None)
+    >>> ps = [terse.post(item) for item in ['a', 'b']]
+    >>> sent = terse.flush()
+    >>> ps[0].get(5)
+    Traceback (most recent call last):
+       ...
+    IOError: 2 items in batch but 1 results
+
+    Items are lines, so they may not contain a line break of any kind::
+
+    >>> bulk.post('two\\nlines')
+    Traceback (most recent call last):
+       ...
+    ValueError: items may not contain line breaks
+    >>> bulk.post('tw\\ro')
+    Traceback (most recent call last):
+       ...
+    ValueError: items may not contain line breaks
+
+    >>> pool.close(); conns.close(); server.shutdown()
+    '''
+    def __new__(cls, base, urlopener, RequestClass, pool,
+                maxItems=100, maxBytes=1 << 16, maxDelay=0.05,
+                compress=True):
+        import zlib
+        from threading import Lock, Timer
+        try:
+            from eventual import makePromise, spawn
+        except ImportError:  # laweb loaded on its own, as by doctest
+            from ocap.eventual import makePromise, spawn
+
+        lock = Lock()
+        current = [None]
+        counts = dict(items=0, batches=0, rawBytes=0, sentBytes=0)
+
+        def fresh():
+            batch = dict(
+                settle=[], chunks=[], size=0, timer=None,
+                z=(zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+                   if compress else None))
+            if maxDelay is not None:
+                batch['timer'] = t = Timer(maxDelay, lambda: send(batch))
+                t.daemon = True
+                t.start()
+            return batch
+
+        def post(_, item):
+            '''Add `item` to the current batch.
+
+            :return: a promise for the item's result line
+            '''
+            if _LINE_BREAKS.intersection(item):
+                raise ValueError('items may not contain line breaks')
+            p, resolve, smash = makePromise()
+            line = item + '\n'
+            with lock:
+                batch = current[0]
+                if batch is None:
+                    batch = current[0] = fresh()
+                batch['chunks'].append(batch['z'].compress(line)
+                                       if compress else line)
+                batch['settle'].append((resolve, smash))
+                batch['size'] += len(line)
+                full = (len(batch['settle']) >= maxItems or
+                        batch['size'] >= maxBytes)
+            if full:
+                send(batch)
+            return p
+
+        def send(batch):
+            '''Send `batch`, unless it was sent already.
+            '''
+            with lock:
+                if current[0] is not batch:
+                    return None
+                current[0] = None
+            if batch['timer'] is not None:
+                batch['timer'].cancel()
+            return spawn(pool, deliver, batch)
+
+        def deliver(batch):
+            body = ''.join(batch['chunks'])
+            headers = {'Content-Type': 'text/plain'}
+            if compress:
+                body += batch['z'].flush()
+                headers['Content-Encoding'] = 'gzip'
+            with lock:
+                counts['items'] += len(batch['settle'])
+                counts['batches'] += 1
+                counts['rawBytes'] += batch['size']
+                counts['sentBytes'] += len(body)
+            try:
+                resp = urlopener.open(RequestClass(base, body, headers))
+                try:
+                    results = resp.read().split('\n')
+                finally:
+                    resp.close()
+                if results[-1] == '':
+                    results.pop()
+                if len(results) != len(batch['settle']):
+                    raise IOError('%d items in batch but %d results'
+                                  % (len(batch['settle']), len(results)))
+            except Exception as ex:
+                for _, smash in batch['settle']:
+                    smash(ex)
+                raise
+            for (resolve, _), result in zip(batch['settle'], results):
+                resolve(result)
+            return len(batch['settle'])
+
+        def flush(_):
+            '''Send the current batch now.
+
+            :return: a promise for the number of items sent
+            '''
+            sent = send(current[0]) if current[0] is not None else None
+            if sent is None:
+                sent, resolve, _ = makePromise()
+                resolve(0)
+            return sent
+
+        def stats(_):
+            with lock:
+                return dict(counts)
+
+        return cls.make(post, flush, stats)
+
+
+_linkParserClass = None  # made on first use, by _LinkParser
+_urljoinFunction = None  # bound on first use, by _urljoin
+
+
+# what unicode.splitlines breaks at, in latin-1; a server may decode
+# the items as text
+_LINE_BREAKS = frozenset('\n\r\x0b\x0c\x1c\x1d\x1e\x85')
+
+
+def _LinkParser():
+    '''Make a parser that collects link targets as markup is fed in.
+    '''
+    global _linkParserClass
+    if _linkParserClass is None:
+        _linkParserClass = _makeLinkParserClass()
+    return _linkParserClass()
+
+
+def _urljoin(base, url):
+    '''`urlparse.urljoin`, imported the first time it is needed.
+    '''
+    global _urljoinFunction
+    if _urljoinFunction is None:
+        from urlparse import urljoin
+        _urljoinFunction = urljoin
+    return _urljoinFunction(base, url)
+
+
+def _makeLinkParserClass():
+    from HTMLParser import HTMLParser
+
+    class LinkParser(HTMLParser):
+        _LINKS = ('a', 'area', 'link')
+
+        def __init__(self):
+            HTMLParser.__init__(self)
+            self._found = []
+
+        def handle_starttag(self, tag, attrs):
+            if tag in self._LINKS:
+                self._found.extend(v for (k, v) in attrs
+                                   if k == 'href' and v)
+
+        handle_startendtag = handle_starttag
+
+        def take(self):
+            '''Links found since the last call.
+            '''
+            found, self._found = self._found, []
+            return found
+
+    return LinkParser
+
+
+def download(src, destDir, name, chunkSize=1 << 16, retries=3,
+             backoff=0.5, sleep=time.sleep):
+    '''Stream `src` into the file `name` under the Editable `destDir`.
+
+    Content goes, a chunk at a time, to `name.part`, which is renamed
+    to `name` once complete. If the transfer is interrupted, it is
+    resumed with a Range request, guarded by If-Range, both on retry
+    and in a later call.
+
+    >>> import os, tempfile
+    >>> from urllib2 import Request
+    >>> from ocap.lafile import Editable, relName
+    >>> tmp = Editable(tempfile.mkdtemp(), os, open)
+    >>> origin = _MockRanges(breakAt=12)
+    >>> web = WebReadable('http://example/', origin, Request)
+    >>> download(web.subRdFile('big'), tmp, 'big.bin', chunkSize=4,
+    ...          sleep=lambda s: None)
+    30
+    >>> (tmp / 'big.bin').ro().getBytes() == origin.content
+    True
+    >>> origin.log
+    ['GET /big', 'GET /big bytes=12-']
+    >>> [relName(ed, tmp) for ed in tmp.subEdFiles()]
+    ['big.bin']
+
+    A part that can't be resumed, e.g. one already complete, or a
+    range that doesn't start where the part ends, means starting
+    over::
+
+    >>> (tmp / 'big.bin').renameTo(tmp / 'big.bin.part')
+    >>> (tmp / 'big.bin.part-validator').setBytes('"v1"')
+    >>> origin = _MockRanges(breakAt=None)
+    >>> web = WebReadable('http://example/', origin, Request)
+    >>> download(web.subRdFile('big'), tmp, 'big.bin')
+    30
+    >>> (tmp / 'big.bin').ro().getBytes() == origin.content
+    True
+    >>> (tmp / 'big.bin.part').setBytes(origin.content[:12])
+    >>> (tmp / 'big.bin.part-validator').setBytes('"v1"')
+    >>> origin = _MockRanges(breakAt=None, slack=2)
+    >>> web = WebReadable('http://example/', origin, Request)
+    >>> download(web.subRdFile('big'), tmp, 'big.bin')
+    30
+    >>> (tmp / 'big.bin').ro().getBytes() == origin.content
+    True
+    >>> origin.log
+    ['GET /big bytes=12-', 'GET /big']
+    >>> [relName(ed, tmp) for ed in tmp.subEdFiles()]
+    ['big.bin']
+    >>> tmp.deleteTree()
+
+    :return: the size of the content
+    '''
+    part = destDir.subEdFile(name + '.part')
+    tag = destDir.subEdFile(name + '.part-validator')
+    for attempt in range(retries + 1):
+        if attempt:
+            sleep(backoff * 2 ** (attempt - 1))
+        have = part.ro().length() if part.ro().exists() else 0
+        validator = None
+        if have and tag.ro().exists():
+            validator = tag.ro().getBytes()
+        try:
+            resp = None
+            if validator:
+                try:
+                    resp = src.inChannel(have, validator)
+                except IOError as ex:
+                    if getattr(ex, 'code', None) != 416:  # not satisfiable
+                        raise
+                else:
+                    if (getattr(resp, 'code', None) == 206 and
+                            _rangeStart(resp.info()) != have):
+                        resp.close()
+                        resp = None
+                if resp is None:  # start over
+                    part.setBytes('')
+                    tag.delete()
+                    validator = None
+            if resp is None:
+                resp = src.inChannel()
+            info = resp.info()
+            resumed = validator and getattr(resp, 'code', None) == 206
+            if not resumed:
+                have = 0
+                validator = (info.getheader('ETag') or
+                             info.getheader('Last-Modified'))
+                if validator:
+                    tag.setBytes(validator)
+                elif tag.ro().exists():
+                    tag.delete()
+            out = part.outChannel(append=bool(resumed))
+            try:
+                for chunk in iter(lambda: resp.read(chunkSize), ''):
+                    out.write(chunk)
+                    have += len(chunk)
+            finally:
+                out.close()
+                resp.close()
+            expected = _contentTotal(info)
+            if expected is not None and have != expected:
+                raise IOError('short transfer: %d of %d bytes'
+                              % (have, expected))
+            break
+        except IOError:
+            if attempt == retries:
+                raise
+    part.renameTo(destDir.subEdFile(name))
+    if tag.ro().exists():
+        tag.delete()
+    return have
+
+
+def _rangeStart(info):
+    '''Offset of the first byte sent, from Content-Range, if given.
+    '''
+    crange = info.getheader('Content-Range', '')
+    try:
+        return int(crange.split(None, 1)[1].split('-', 1)[0])
+    except (IndexError, ValueError):
+        return None
+
+
+def _contentTotal(info):
+    '''Total size from Content-Range, else Content-Length, if given.
+    '''
+    crange = info.getheader('Content-Range')
+    if crange and '/' in crange and not crange.endswith('*'):
+        return int(crange.rsplit('/', 1)[1])
+    length = info.getheader('Content-Length')
+    return int(length) if length else None
 
 
 class _MockMostPagesOKButSome404(object):
-    '''Raise 404 for pages containing given strings; otherwise succeed.
+    '''Raise 404 for pages containing given strings, and a garbled
+    response for those containing any of `broken`; otherwise succeed.
     '''
-    def __init__(self, bad):
+    def __init__(self, bad, broken=''):
         self.bad = bad
+        self.broken = broken
 
     def open(self, request_or_address, content=None):
         from StringIO import StringIO
+        from httplib import BadStatusLine
 
         try:
             address = request_or_address.get_full_url()
@@ -144,8 +744,63 @@ class _MockMostPagesOKButSome404(object):
 
         if [txt for txt in self.bad if txt in address]:
             raise IOError('404...')
+        if [txt for txt in self.broken if txt in address]:
+            raise BadStatusLine('')
 
         if content:
             return StringIO('you posted: ' + content)
 
         return StringIO('page content...')
+
+
+class _MockRanges(object):
+    '''Serve one resource, honoring Range; the first response breaks
+    off after `breakAt` bytes. Ranges start `slack` bytes early, and
+    those beyond the end get 416.
+    '''
+    content = ''.join(chr(ord('a') + i % 26) for i in range(30))
+
+    def __init__(self, breakAt, slack=0):
+        self.breakAt = breakAt
+        self.slack = slack
+        self.log = []
+
+    def open(self, request_or_address, content=None):
+        from StringIO import StringIO
+        from mimetools import Message
+        from urllib import addinfourl
+        from urllib2 import HTTPError
+
+        try:
+            url = request_or_address.get_full_url()
+            byteRange = request_or_address.get_header('Range')
+        except AttributeError:
+            url, byteRange = request_or_address, None
+        self.log.append(' '.join(['GET', url[len('http://example'):]] +
+                                 ([byteRange] if byteRange else [])))
+        start = int(byteRange[len('bytes='):-1]) if byteRange else 0
+        total = len(self.content)
+        if start >= total:
+            raise HTTPError(url, 416, 'Requested Range Not Satisfiable',
+                            Message(StringIO('Content-Range: bytes */%d\r\n'
+                                             % total)), StringIO(''))
+        start = max(start - self.slack, 0)
+        body = self.content[start:]
+        headers = 'ETag: "v1"\r\nContent-Length: %d\r\n' % len(body)
+        if start:
+            headers += 'Content-Range: bytes %d-%d/%d\r\n' % (
+                start, total - 1, total)
+
+        breakAt, self.breakAt = self.breakAt, None
+        fp = StringIO(body)
+        if breakAt is not None:
+            def read(n=-1):
+                left = breakAt - fp.tell()
+                if left <= 0:
+                    raise IOError('connection reset')
+                return StringIO.read(fp, left if n < 0 else min(n, left))
+            fp.read = read
+
+        resp = addinfourl(fp, Message(StringIO(headers)), url)
+        resp.code = 206 if start else 200
+        return resp
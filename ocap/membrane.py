@@ -0,0 +1,217 @@
+'''membrane -- revocable, transitive wrappers for capabilities
+
+A `Membrane` wraps an object so that whatever is obtained through
+the wrapper comes wrapped too; revoking the membrane cuts off the
+whole graph of wrappers at once::
+
+  >>> import os, tempfile
+  >>> from ocap.lafile import Editable
+  >>> tmp = Editable(tempfile.mkdtemp(), os, open)
+  >>> m = Membrane()
+  >>> ed = m.wrap(tmp)
+  >>> ed
+  Editable(...)
+  >>> (ed / 'a.txt').setBytes('hello')
+  >>> a = ed.ro() / 'a.txt'
+  >>> a.getBytes()
+  'hello'
+  >>> [sub.getBytes() for sub in ed.ro().subRdFiles()]
+  ['hello']
+
+Each object is wrapped once, and wrappers passed back in are
+unwrapped, so identity is preserved on both sides::
+
+  >>> ed.ro() is ed.ro()
+  True
+  >>> ident = m.wrap(lambda obj: obj)
+  >>> ident(ed) is ed
+  True
+
+Objects passed in, such as callbacks, are wrapped going the other
+way, so what they are given from inside comes out wrapped::
+
+  >>> from multiprocessing.pool import ThreadPool
+  >>> from ocap.eventual import AsyncEditable
+  >>> pool = ThreadPool(2)
+  >>> got = []
+  >>> m.wrap(AsyncEditable(tmp, pool)).subEdFiles().when(got.extend).get(5)
+  >>> got
+  [AsyncEditable(...)]
+
+Revocation takes effect everywhere at once::
+
+  >>> m.revoke()
+  >>> a.getBytes()
+  Traceback (most recent call last):
+     ...
+  ReferenceError: revoked
+  >>> ed.ro()
+  Traceback (most recent call last):
+     ...
+  ReferenceError: revoked
+  >>> a
+  <revoked>
+  >>> got[0].ro()
+  Traceback (most recent call last):
+     ...
+  ReferenceError: revoked
+
+  >>> pool.close(); tmp.deleteTree()
+
+.. note:: As with :mod:`sealing`, python's stack introspection
+          mechanisms can get around this.
+'''
+
+from collections import deque
+from types import GeneratorType
+from weakref import ref
+
+from encap import ESuite, slot, val, update
+
+_PLAIN = frozenset([type(None), bool, int, long, float, complex, str,
+                    unicode])
+
+
+class Membrane(ESuite):
+    '''Revocable membrane.
+
+    Results of calls through a wrapper are wrapped in turn, except
+    plain data; lists, tuples, dicts, and generators are wrapped
+    item by item. Arguments cross the other way: those that are
+    wrappers from this membrane are unwrapped, and others, except
+    plain data, are wrapped for use inside.
+
+    The `keep` most recently made wrappers are kept alive, so that
+    an object fetched over and over isn't wrapped each time.
+    '''
+    def __new__(cls, keep=256):
+        revoked = slot(False)
+        recent = deque(maxlen=keep)
+        # for each direction: id(target) -> weak ref to wrapper,
+        # and id(wrapper) -> target
+        outward, inward = ({}, {}), ({}, {})
+
+        def check():
+            if val(revoked):
+                raise ReferenceError('revoked')
+
+        def wrap(_, obj):
+            check()
+            return toOut(obj)
+
+        outMade, inMade = outward[0], inward[0]
+
+        # The common cases, plain data and objects wrapped before,
+        # are handled here, without a call to _cross.
+        def toOut(obj):
+            if type(obj) in _PLAIN:
+                return obj
+            r = outMade.get(id(obj))
+            w = r() if r is not None else None
+            return w if w is not None else _cross(obj, outward, inward,
+                                                  toOut, toIn)
+
+        def toIn(obj):
+            if type(obj) in _PLAIN:
+                return obj
+            r = inMade.get(id(obj))
+            w = r() if r is not None else None
+            return w if w is not None else _cross(obj, inward, outward,
+                                                  toIn, toOut)
+
+        def _cross(obj, this, other, there, back):
+            '''Carry `obj` across in the direction of `this`, whose
+            wrappers convert results with `there` and arguments with
+            `back`.
+            '''
+            made, targets = this
+            target = other[1].get(id(obj))
+            if target is not None:
+                return target
+            if isinstance(obj, GeneratorType):
+                return _items(obj, there)
+            if isinstance(obj, (list, tuple)):
+                return type(obj)(there(x) for x in obj)
+            if isinstance(obj, dict):
+                return dict((k, there(v)) for (k, v) in obj.items())
+            w = _Wrapper(obj, revoked, there, back)
+            k, kw = id(obj), id(w)
+
+            def gone(r):
+                if made.get(k) is r:
+                    del made[k]
+                targets.pop(kw, None)
+            made[k] = ref(w, gone)
+            targets[kw] = obj
+            recent.append(w)
+            return w
+
+        def _items(gen, there):
+            for x in gen:
+                check()
+                yield there(x)
+
+        def revoke(_):
+            update(revoked, True)
+            for made, targets in (outward, inward):
+                made.clear()
+                targets.clear()
+            recent.clear()
+
+        def isRevoked(_):
+            return val(revoked)
+
+        return cls.make(wrap, revoke, isRevoked)
+
+
+class _Wrapper(ESuite):
+    '''Forward to `target` until `revoked`.
+
+    Methods are looked up on `target` once, then kept in the
+    wrapper's `__dict__`, where later lookups find them without a
+    call to `__getattr__`; they check `revoked` when called.
+    '''
+    def __new__(cls, target, revoked, wrap, unwrap):
+        def forward(m):
+            def method(*args, **kwargs):
+                if revoked[0]:  # i.e. val(revoked), on the hot path
+                    raise ReferenceError('revoked')
+                if args:
+                    args = [unwrap(a) for a in args]
+                if kwargs:
+                    kwargs = dict((k, unwrap(v))
+                                  for (k, v) in kwargs.items())
+                r = m(*args, **kwargs)
+                return r if type(r) in _PLAIN else wrap(r)
+            return method
+
+        def __getattr__(self, name):
+            if val(revoked):
+                raise ReferenceError('revoked')
+            v = getattr(target, name)
+            if not callable(v):
+                return wrap(v)
+            m = self.__dict__[name] = forward(v)
+            return m
+
+        call = forward(target)
+        div = forward(lambda o: target / o)
+
+        def __call__(_, *args, **kwargs):
+            return call(*args, **kwargs)
+
+        def __div__(_, other):
+            return div(other)
+
+        def __iter__(self):
+            return forward(iter)(self)
+
+        def next(_):
+            return forward(target.next)()
+
+        def __repr__(_):
+            return '<revoked>' if val(revoked) else repr(target)
+
+        return cls.make(__call__, __div__, __iter__, next, __repr__,
+                        __getattr__=__getattr__,
+                        __truediv__=__div__)
@@ -0,0 +1,196 @@
+'''merkle -- content digests and Merkle trees over a Readable
+
+`tree_digest` hashes each file under a `Readable` root, a chunk at a
+time, optionally on a pool of threads (hashlib lets go of the GIL
+while it works), and gives each directory the hash of its entries::
+
+  >>> import os, tempfile
+  >>> from multiprocessing.pool import ThreadPool
+  >>> from lafile import Editable
+  >>> tmp = Editable(tempfile.mkdtemp(), os, open)
+  >>> for top in ['one', 'two']:
+  ...     (tmp / top).mkDir(); (tmp / top / 'docs').mkDir()
+  ...     (tmp / top / 'a.txt').setBytes('a')
+  ...     (tmp / top / 'docs' / 'b.txt').setBytes('b' * 1000)
+
+  >>> pool = ThreadPool(2)
+  >>> cache = DigestCache(os.stat)
+  >>> one = tree_digest(tmp.ro() / 'one', pool, cache)
+  >>> sorted(one)
+  ['', 'a.txt', 'docs', 'docs/b.txt']
+  >>> one['a.txt'][0] == file_digest(tmp.ro() / 'one' / 'a.txt')
+  True
+
+Equal trees have equal hashes, so comparing two trees costs one
+comparison per differing directory entry, not one per file::
+
+  >>> two = tree_digest(tmp.ro() / 'two', pool, cache)
+  >>> one[''] == two['']
+  True
+  >>> (tmp / 'two' / 'docs' / 'b.txt').setBytes('B' * 999)
+  >>> (tmp / 'two' / 'docs' / 'c.txt').setBytes('c')
+  >>> two = tree_digest(tmp.ro() / 'two', pool, cache)
+  >>> one['docs'] == two['docs'], one['a.txt'] == two['a.txt']
+  (False, True)
+  >>> list(diff_digests(one, two))
+  [('modified', 'docs/b.txt'), ('added', 'docs/c.txt')]
+
+Files whose (mtime, size, inode) haven't changed aren't read again::
+
+  >>> stats = cache.stats()
+  >>> stats['hits'], stats['misses']
+  (1, 6)
+
+A cache kept in an `Editable` lasts from one run to the next::
+
+  >>> cache.save(tmp / 'digests')
+  >>> again = DigestCache(os.stat, tmp.ro() / 'digests')
+  >>> tree_digest(tmp.ro() / 'one', cache=again) == one
+  True
+  >>> again.stats()['misses']
+  0
+
+  >>> pool.close(); tmp.deleteTree()
+'''
+
+from hashlib import sha256
+from threading import Lock
+
+from encap import ESuite
+from lafile import relName_rd, walk_rd
+from rewalk import dumps, loads
+
+
+def file_digest(rd, chunkSize=1 << 20):
+    '''SHA-256 of the content of `rd`, read `chunkSize` at a time.
+    '''
+    h = sha256()
+    f = rd.inChannel()
+    try:
+        for chunk in iter(lambda: f.read(chunkSize), ''):
+            h.update(chunk)
+    finally:
+        f.close()
+    return h.hexdigest()
+
+
+def tree_digest(root, pool=None, cache=None, chunkSize=1 << 20):
+    '''Hash each file and directory under `root`.
+
+    A directory's hash covers the names, kinds, and hashes of its
+    entries.
+
+    :param pool: e.g. `multiprocessing.pool.ThreadPool`
+    :param cache: a `DigestCache`
+    :return: dict mapping each relative name ('' for `root`) to
+             (hex digest, entry names), where entry names is a
+             sorted tuple for a directory and None for a file.
+    '''
+    levels = list(walk_rd(root, lazy=True))
+    files = [f for (_, _, fs) in levels for f in fs]
+
+    def digest(rd):
+        if cache is None:
+            return file_digest(rd, chunkSize)
+        return cache.digest(rd.fullPath(),
+                            lambda: file_digest(rd, chunkSize))
+
+    sums = (pool.map if pool is not None else map)(digest, files)
+    tree = dict((relName_rd(f, root), (d, None))
+                for (f, d) in zip(files, sums))
+    for top, dirs, fs in reversed(levels):
+        rel = relName_rd(top, root)
+        names = tuple(sorted(relName_rd(s, top) for s in dirs + fs))
+        h = sha256()
+        for n in names:
+            d, kids = tree[_join(rel, n)]
+            h.update('%s%s%d:%s' % ('f' if kids is None else 'd', d,
+                                    len(n), n))
+        tree[rel] = (h.hexdigest(), names)
+    return tree
+
+
+def diff_digests(old, new, rel=''):
+    '''Compare two results of `tree_digest`, skipping equal subtrees.
+
+    :return: iterator of (change, relative name), as from
+             `rewalk.diff_walk_rd`
+    '''
+    (d0, names0), (d1, names1) = old[rel], new[rel]
+    if d0 == d1:
+        return
+    if names0 is None or names1 is None:
+        if names0 is None and names1 is None:
+            yield 'modified', rel
+        else:
+            for change in _all(old, rel, 'removed'):
+                yield change
+            for change in _all(new, rel, 'added'):
+                yield change
+        return
+    for n in sorted(set(names0) | set(names1)):
+        sub = _join(rel, n)
+        if sub not in new:
+            for change in _all(old, sub, 'removed'):
+                yield change
+        elif sub not in old:
+            for change in _all(new, sub, 'added'):
+                yield change
+        else:
+            for change in diff_digests(old, new, sub):
+                yield change
+
+
+def _all(tree, rel, change):
+    yield change, rel
+    for n in tree[rel][1] or ():
+        for x in _all(tree, _join(rel, n), change):
+            yield x
+
+
+def _join(rel, n):
+    return n if rel == '' else rel + '/' + n
+
+
+class DigestCache(ESuite):
+    '''File digests by path, valid while the file's (mtime, size,
+    inode) are unchanged.
+
+    :param os_stat: e.g. `os.stat`
+    :param storeRd: optional `Readable` of a cache saved before
+    '''
+    def __new__(cls, os_stat, storeRd=None):
+        entries = {}  # path -> (stamp, digest)
+        lock = Lock()
+        counts = {'hits': 0, 'misses': 0}
+
+        if storeRd is not None and storeRd.exists():
+            for path, (mtime, size, ino, d) in loads(
+                    storeRd.getBytes()).items():
+                entries[path] = ((mtime, size, ino), str(d))
+
+        def digest(_, path, compute):
+            st = os_stat(path)
+            stamp = (st.st_mtime, st.st_size, st.st_ino)
+            with lock:
+                hit = entries.get(path)
+                if hit is not None and hit[0] == stamp:
+                    counts['hits'] += 1
+                    return hit[1]
+                counts['misses'] += 1
+            d = compute()
+            with lock:
+                entries[path] = (stamp, d)
+            return d
+
+        def save(_, storeEd):
+            with lock:
+                snapshot = dict((path, list(stamp) + [d])
+                                for (path, (stamp, d)) in entries.items())
+            storeEd.setBytes(dumps(snapshot))
+
+        def stats(_):
+            with lock:
+                return dict(counts, entries=len(entries))
+
+        return cls.make(digest, save, stats)
@@ -0,0 +1,156 @@
+'''parmap -- parallel map over a Readable tree on a process pool
+
+`map_rd` applies a function to every file under a `Readable` root on
+a pool of worker processes, so CPU-bound work isn't held to one core
+by the GIL. Each worker gets only a descriptor (see
+`lafile.rebuild`) for the one file it works on, and rebuilds it with
+the `os` and `open` given to it by `init_worker`::
+
+  >>> import os, tempfile
+  >>> from multiprocessing import Pool
+  >>> from lafile import Editable, relName_rd
+  >>> tmp = Editable(tempfile.mkdtemp(), os, open)
+  >>> (tmp / 'sub').mkDir()
+  >>> for n, text in [('a', 'x\\n'), ('b', 'x\\ny\\n'), ('sub/c', 'z\\n')]:
+  ...     (tmp / n).setBytes(text)
+
+  >>> pool = Pool(2, initializer=init_worker)
+  >>> sorted((relName_rd(rd, tmp.ro()), n)
+  ...        for rd, n in map_rd(tmp.ro(), _lineCount, pool, chunksize=2))
+  [('a', 1), ('b', 2), ('sub/c', 1)]
+
+With `ordered=False`, results come as chunks finish. An exception
+in a worker is raised in the caller::
+
+  >>> list(map_rd(tmp.ro(), _fail, pool, ordered=False))
+  ... # doctest: +ELLIPSIS
+  Traceback (most recent call last):
+    ...
+  ValueError: cannot digest ...
+
+So is a failure to send the work, e.g. a function that can't be
+pickled::
+
+  >>> list(map_rd(tmp.ro(), lambda rd: 1, pool, ordered=False))
+  ... # doctest: +ELLIPSIS
+  Traceback (most recent call last):
+    ...
+  PicklingError: Can't pickle ...
+
+  >>> pool.close(); pool.join(); tmp.deleteTree()
+'''
+
+from collections import deque
+from Queue import Empty, Queue
+
+from lafile import _paged, rebuild, walk_rd
+
+_powers = None  # (os, open) in a worker process, from init_worker
+
+
+def init_worker():
+    '''Pool initializer: give this worker process `os` and `open`.
+    '''
+    global _powers
+    import os
+    _powers = (os, open)
+
+
+def map_rd(root, f, pool, chunksize=16, maxPending=8, ordered=True):
+    '''Apply `f` to each file under `root`, in worker processes.
+
+    :param f: a function of one `Readable`; it must be picklable,
+              i.e. defined at the top level of a module
+    :param pool: a `multiprocessing.Pool` made with
+                 `initializer=init_worker`
+    :param chunksize: files sent to a worker at a time
+    :param maxPending: most chunks in flight at once
+    :param ordered: give results in the order of `walk_rd`,
+                    rather than as they complete
+    :return: iterator of (file, result)
+    '''
+    chunks = _paged((rd for _, _, files in walk_rd(root, lazy=True)
+                     for rd in files), chunksize)
+    if ordered:
+        return _ordered(chunks, f, pool, maxPending)
+    return _unordered(chunks, f, pool, maxPending)
+
+
+def _submit(pool, f, chunk, callback=None):
+    return pool.apply_async(_runChunk, (f, [rd.describe() for rd in chunk]),
+                            callback=callback)
+
+
+def _ordered(chunks, f, pool, maxPending):
+    pending = deque()
+    for chunk in chunks:
+        pending.append((chunk, _submit(pool, f, chunk)))
+        if len(pending) >= maxPending:
+            for x in _results(*pending.popleft()):
+                yield x
+    while pending:
+        for x in _results(*pending.popleft()):
+            yield x
+
+
+def _unordered(chunks, f, pool, maxPending, poll=0.05):
+    # The pool calls back only on success, so the callback just
+    # wakes us; failures are found by polling the results.
+    wake = Queue()
+    pending = []
+
+    def finish():
+        while True:
+            for i, (chunk, r) in enumerate(pending):
+                if r.ready():
+                    del pending[i]
+                    return _results(chunk, r)
+            try:
+                wake.get(timeout=poll)
+            except Empty:
+                pass
+
+    for chunk in chunks:
+        pending.append((chunk, _submit(pool, f, chunk,
+                                       lambda _: wake.put(None))))
+        if len(pending) >= maxPending:
+            for x in finish():
+                yield x
+    while pending:
+        for x in finish():
+            yield x
+
+
+def _results(chunk, async_result):
+    return _zipResults(chunk, async_result.get())
+
+
+def _zipResults(chunk, out):
+    err, results = out
+    if err is not None:
+        raise err
+    return zip(chunk, results)
+
+
+def _runChunk(f, descs):
+    '''Worker side: rebuild each capability and apply `f`.
+
+    :return: (None, results), or (exception, None); exceptions are
+             passed back rather than raised, since a pool callback
+             never hears of a raised one.
+    '''
+    if _powers is None:
+        return RuntimeError('worker has no powers; see init_worker'), None
+    os, openf = _powers
+    try:
+        return None, [f(rebuild(desc, os, openf)) for desc in descs]
+    except Exception as ex:
+        return ex, None
+
+
+def _lineCount(rd):
+    return rd.getBytes().count('\n')
+
+
+def _fail(rd):
+    raise ValueError('cannot digest %s' % rd.fullPath())
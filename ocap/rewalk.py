@@ -0,0 +1,194 @@
+'''rewalk -- incremental re-walk of a Readable tree
+
+A snapshot records, for each directory, its modification time and
+its entries. A later walk lists only the directories whose
+modification time changed. Every directory is still stat'ed, but no
+other entry is, so the cost follows the number of directories plus
+the number of changes, not the number of files::
+
+  >>> import os, tempfile
+  >>> from lafile import Editable
+  >>> tmp = Editable(tempfile.mkdtemp(), os, open)
+  >>> tree, snap = tmp / 'tree', tmp / 'snap'
+  >>> tree.mkDir(); (tree / 'docs').mkDir()
+  >>> (tree / 'a.txt').setBytes('a'); (tree / 'docs' / 'b.txt').setBytes('b')
+
+The first walk finds everything::
+
+  >>> sorted(rewalk_rd(tree.ro(), snap))
+  [('added', 'a.txt'), ('added', 'docs'), ('added', 'docs/b.txt')]
+
+Later walks find only what changed::
+
+  >>> list(rewalk_rd(tree.ro(), snap))
+  []
+  >>> (tree / 'docs' / 'c.txt').setBytes('c')
+  >>> (tree / 'a.txt').delete()
+  >>> def touch(ed, t): os.utime(ed.ro().fullPath(), (t, t))
+  >>> touch(tree, 1); touch(tree / 'docs', 1)
+  >>> sorted(rewalk_rd(tree.ro(), snap))
+  [('added', 'docs/c.txt'), ('removed', 'a.txt')]
+
+Files are compared by modification time and size, but only in
+directories that changed; a file rewritten in place, leaving its
+directory alone, is not noticed::
+
+  >>> (tree / 'docs' / 'c.txt').setBytes('cc'); touch(tree / 'docs', 2)
+  >>> list(rewalk_rd(tree.ro(), snap))
+  [('modified', 'docs/c.txt')]
+
+With `restat`, the files in unchanged directories are stat'ed too
+(still without listing the directories), so in-place changes are
+found as well::
+
+  >>> (tree / 'docs' / 'c.txt').setBytes('ccc'); touch(tree / 'docs', 2)
+  >>> list(rewalk_rd(tree.ro(), snap))
+  []
+  >>> (tree / 'docs' / 'c.txt').outChannel(append=True).write('c')
+  >>> list(rewalk_rd(tree.ro(), snap, restat=True))
+  [('modified', 'docs/c.txt')]
+
+A directory changed twice within one tick of the filesystem's clock
+may show the same modification time both times. So a directory
+modified less than `tick` seconds before it was listed is listed
+again next time, whatever its modification time::
+
+  >>> (tree / 'new').mkDir()
+  >>> t = os.stat((tree / 'new').ro().fullPath()).st_mtime
+  >>> list(rewalk_rd(tree.ro(), snap, clock=lambda: t + 0.5))
+  [('added', 'new')]
+  >>> (tree / 'new' / 'd.txt').setBytes('d'); touch(tree / 'new', t)
+  >>> list(rewalk_rd(tree.ro(), snap, clock=lambda: t + 5))
+  [('added', 'new/d.txt')]
+
+  >>> tmp.deleteTree()
+
+'''
+
+import json
+import time
+import zlib
+
+from lafile import relName_rd
+
+
+def rewalk_rd(top, snapEd, restat=False, tick=1.0, clock=time.time):
+    '''Walk `top`, yielding (change, relative name) for each entry
+    added, removed, or modified since the snapshot in `snapEd`.
+
+    The new snapshot is written once the walk is complete.
+    '''
+    snapRd = snapEd.ro()
+    old = loads(snapRd.getBytes()) if snapRd.exists() else {}
+    new = {}
+    for change in diff_walk_rd(top, old, new, restat, tick, clock):
+        yield change
+    snapEd.setBytes(dumps(new))
+
+
+def dumps(snapshot):
+    '''Encode a snapshot compactly.
+
+    Names are byte strings; latin-1 carries any byte through JSON.
+
+    >>> loads(dumps({'': [1.5, {'caf\\xe9': [False, 1.5, 3]}]}))
+    {'': [1.5, {'caf\\xe9': [False, 1.5, 3]}]}
+    '''
+    return zlib.compress(json.dumps(snapshot, separators=(',', ':'),
+                                    encoding='latin-1'))
+
+
+def loads(data):
+    return json.loads(zlib.decompress(data), object_pairs_hook=_byteKeys)
+
+
+def _byteKeys(pairs):
+    return dict((k.encode('latin-1'), v) for (k, v) in pairs)
+
+
+def diff_walk_rd(top, old, new, restat=False, tick=1.0, clock=time.time):
+    '''Compare `top` with snapshot `old`, recording the current state
+    in `new`.
+
+    A snapshot maps the relative name of each directory to
+    `[mtime, {name: [isDir, mtime, size]}]`; mtime is None for a
+    directory modified within `tick` seconds of being listed, by
+    `clock`, so that the next walk lists it again.
+
+    With `restat`, files in directories whose own modification time
+    is unchanged are stat'ed and compared too.
+    '''
+    todo = [(top, '')]
+    while todo:
+        rd, rel = todo.pop()
+        mtime = rd.lastModified()
+        was = old.get(rel)
+
+        entries = None
+        if was is not None and was[0] == mtime:
+            entries = was[1]
+            if restat:
+                try:
+                    entries, changed = _restat(rd, entries)
+                except (IOError, OSError):
+                    entries = None  # changed as we looked; list it
+                else:
+                    for n in changed:
+                        yield 'modified', _join(rel, n)
+
+        if entries is not None:
+            subdirs = [(rd.subRdFile(n), _join(rel, n))
+                       for (n, info) in entries.items() if info[0]]
+        else:
+            before = was[1] if was is not None else {}
+            entries, subdirs = {}, []
+            for sub in rd.iterSubRdFiles():
+                n = relName_rd(sub, rd)
+                isDir = sub.isDir()
+                info = ([True, None, None] if isDir
+                        else [False, sub.lastModified(), sub.length()])
+                entries[n] = info
+                prev = before.get(n)
+                if prev is None:
+                    yield 'added', _join(rel, n)
+                elif prev[0] != isDir:
+                    for gone in _removed(old, _join(rel, n), prev):
+                        yield gone
+                    yield 'added', _join(rel, n)
+                elif prev != info:
+                    yield 'modified', _join(rel, n)
+                if isDir:
+                    subdirs.append((sub, _join(rel, n)))
+            for n, prev in before.items():
+                if n not in entries:
+                    for gone in _removed(old, _join(rel, n), prev):
+                        yield gone
+
+        racy = mtime > clock() - tick
+        new[rel] = [None if racy else mtime, entries]
+        todo.extend(reversed(subdirs))
+
+
+def _restat(rd, entries):
+    fresh, changed = {}, []
+    for n, info in entries.items():
+        if not info[0]:
+            sub = rd.subRdFile(n)
+            now = [False, sub.lastModified(), sub.length()]
+            if now != info:
+                changed.append(n)
+                info = now
+        fresh[n] = info
+    return fresh, sorted(changed)
+
+
+def _removed(old, rel, info):
+    if info[0] and rel in old:
+        for n, sub in old[rel][1].items():
+            for gone in _removed(old, _join(rel, n), sub):
+                yield gone
+    yield 'removed', rel
+
+
+def _join(rel, n):
+    return n if rel == '' else rel + '/' + n
@@ -0,0 +1,348 @@
+'''webcache -- HTTP caching for WebReadable
+
+`CachingOpener` wraps a urlopener and stands in for it wherever
+`WebReadable` takes one. Responses are kept according to their
+Cache-Control (or Expires) headers; stale ones are revalidated with
+If-None-Match / If-Modified-Since, so an unchanged resource costs a
+304 rather than a download::
+
+  >>> origin = _MockOrigin({'/a': ('"v1"', 'max-age=60', 'aaa'),
+  ...                       '/b': ('"v1"', 'no-cache', 'bbbb')})
+  >>> clock = _MockClock()
+  >>> cache = CachingOpener(origin, _Request, clock=clock)
+  >>> [cache.open('http://example/a').read() for _ in range(3)]
+  ['aaa', 'aaa', 'aaa']
+  >>> [cache.open('http://example/b').read() for _ in range(3)]
+  ['bbbb', 'bbbb', 'bbbb']
+  >>> origin.log
+  ['GET /a', 'GET /b', 'GET /b If-None-Match', 'GET /b If-None-Match']
+
+Once `max-age` passes, the entry is revalidated; a changed resource
+is fetched in full::
+
+  >>> clock.now += 61
+  >>> origin.resources['/a'] = ('"v2"', 'max-age=60', 'AAA')
+  >>> cache.open('http://example/a').read()
+  'AAA'
+
+A HEAD request, as from `WebReadable.exists()`, is answered from a
+fresh entry; failed ones are remembered for `negativeTTL` seconds::
+
+  >>> cache.open(_HeadRequest('http://example/a')).code
+  200
+  >>> for attempt in range(2):
+  ...     try:
+  ...         cache.open(_HeadRequest('http://example/missing'))
+  ...     except IOError as ex:
+  ...         print(ex)
+  HTTP Error 404: Not Found
+  HTTP Error 404: Not Found
+  >>> origin.log[-2:]
+  ['GET /a If-None-Match', 'HEAD /missing']
+
+  >>> sorted(cache.stats().items())
+  ... # doctest: +NORMALIZE_WHITESPACE
+  [('bytesSaved', 14), ('hits', 3), ('misses', 3), ('negativeHits', 1),
+   ('requestsSaved', 4), ('revalidated', 2)]
+
+Entries may also be kept on disk, in a directory given as an
+`Editable`, where they outlive the process::
+
+  >>> import os, tempfile
+  >>> from ocap.lafile import Editable
+  >>> tmp = Editable(tempfile.mkdtemp(), os, open)
+  >>> disk = CachingOpener(origin, _Request, store=tmp, clock=clock)
+  >>> disk.open('http://example/a').read()
+  'AAA'
+  >>> again = CachingOpener(origin, _Request, store=tmp, clock=clock)
+  >>> again.open('http://example/a').read()
+  'AAA'
+  >>> again.stats()['hits']
+  1
+
+Header bytes are kept as they came; an entry that can't be read,
+e.g. one cut short by a crash, is a miss::
+
+  >>> entry = dict(headers='X-Name: caf\\xe9\\r\\n', body='c', etag=None,
+  ...              lastModified=None, fresh=0)
+  >>> _storeEntry(tmp, 'http://example/c', entry)
+  >>> _loadEntry(tmp, 'http://example/c') == entry
+  True
+  >>> (tmp / _entryName('http://example/c')).setBytes('{"head')
+  >>> _loadEntry(tmp, 'http://example/c') is None
+  True
+  >>> tmp.deleteTree()
+
+'''
+
+import json
+import time
+from collections import OrderedDict
+from email.utils import mktime_tz, parsedate_tz
+from hashlib import sha1
+from mimetools import Message
+from StringIO import StringIO
+from threading import Lock
+from urllib import addinfourl
+
+from encap import ESuite
+
+
+class CachingOpener(ESuite):
+    '''Caching wrapper for a urlopener.
+
+    :param urlopener: as from `urllib2.build_opener()`
+    :param RequestClass: e.g. `urllib2.Request`
+    :param maxBytes: bound on the bodies kept in memory
+    :param store: optional `Editable` directory for entries
+    :param negativeTTL: seconds to remember failed HEAD requests
+    '''
+    def __new__(cls, urlopener, RequestClass, maxBytes=1 << 24,
+                store=None, negativeTTL=5.0, clock=time.time):
+        memory = OrderedDict()  # url -> entry
+        held = [0]
+        failed = {}  # url -> (until, message)
+        lock = Lock()
+        counts = dict(hits=0, revalidated=0, misses=0, negativeHits=0,
+                      bytesSaved=0)
+
+        def count(what, saved=0):
+            with lock:
+                counts[what] += 1
+                counts['bytesSaved'] += saved
+
+        def remember(url, entry):
+            with lock:
+                old = memory.pop(url, None)
+                if old is not None:
+                    held[0] -= len(old['body'])
+                if len(entry['body']) <= maxBytes:
+                    memory[url] = entry
+                    held[0] += len(entry['body'])
+                while held[0] > maxBytes:
+                    _, evicted = memory.popitem(last=False)
+                    held[0] -= len(evicted['body'])
+            if store is not None:
+                _storeEntry(store, url, entry)
+
+        def recall(url):
+            with lock:
+                entry = memory.pop(url, None)
+                if entry is not None:
+                    memory[url] = entry
+                    return entry
+            if store is not None:
+                entry = _loadEntry(store, url)
+                if entry is not None:
+                    remember(url, entry)
+            return entry
+
+        def forget(url):
+            with lock:
+                old = memory.pop(url, None)
+                if old is not None:
+                    held[0] -= len(old['body'])
+
+        def open(_, request_or_address, content=None):
+            try:
+                url = request_or_address.get_full_url()
+                method = request_or_address.get_method()
+                personal = [h for h in ('Range', 'Authorization')
+                            if request_or_address.has_header(h)]
+            except AttributeError:
+                url, method, personal = request_or_address, 'GET', []
+
+            unsafe = content is not None or method not in ('GET', 'HEAD')
+            if unsafe:
+                forget(url)
+            if unsafe or personal:
+                return urlopener.open(request_or_address, content)
+
+            now = clock()
+            entry = recall(url)
+
+            if method == 'HEAD':
+                if entry is not None and entry['fresh'] > now:
+                    count('hits')
+                    return _respond(entry, url, body=False)
+                with lock:
+                    until, message = failed.get(url, (0, None))
+                if until > now:
+                    count('negativeHits')
+                    raise IOError(message)
+                try:
+                    return urlopener.open(request_or_address)
+                except IOError as ex:
+                    with lock:
+                        for gone in [u for (u, (t, _)) in failed.items()
+                                     if t <= now]:
+                            del failed[gone]
+                        failed[url] = (now + negativeTTL, str(ex))
+                    raise
+
+            if entry is not None and entry['fresh'] > now:
+                count('hits', len(entry['body']))
+                return _respond(entry, url)
+
+            if entry is not None:
+                headers = {}
+                if entry['etag']:
+                    headers['If-None-Match'] = entry['etag']
+                if entry['lastModified']:
+                    headers['If-Modified-Since'] = entry['lastModified']
+                try:
+                    resp = urlopener.open(RequestClass(url, None, headers))
+                except IOError as ex:
+                    if getattr(ex, 'code', None) != 304:
+                        raise
+                    entry = dict(entry, fresh=_freshUntil(ex.info(), now))
+                    remember(url, entry)
+                    count('revalidated', len(entry['body']))
+                    return _respond(entry, url)
+            else:
+                resp = urlopener.open(request_or_address)
+
+            count('misses')
+            info = resp.info()
+            if 'no-store' in info.getheader('Cache-Control', '') or not (
+                    info.getheader('Cache-Control') or
+                    info.getheader('Expires') or
+                    info.getheader('ETag') or
+                    info.getheader('Last-Modified')):
+                return resp
+            entry = dict(headers=''.join(info.headers),
+                         body=resp.read(),
+                         etag=info.getheader('ETag'),
+                         lastModified=info.getheader('Last-Modified'),
+                         fresh=_freshUntil(info, now))
+            remember(url, entry)
+            return _respond(entry, url)
+
+        def stats(_):
+            with lock:
+                return dict(counts,
+                            requestsSaved=(counts['hits'] +
+                                           counts['negativeHits']))
+
+        return cls.make(open, stats)
+
+
+def _freshUntil(info, now):
+    '''When does a response with these headers go stale?
+    '''
+    directives = dict(
+        (d.split('=', 1) + [None])[:2]
+        for d in [d.strip().lower()
+                  for d in info.getheader('Cache-Control', '').split(',')]
+        if d)
+    if 'no-cache' in directives or 'no-store' in directives:
+        return now
+    age = int(info.getheader('Age', '0') or 0)
+    if directives.get('max-age'):
+        try:
+            return now + int(directives['max-age'].strip('"')) - age
+        except ValueError:
+            return now
+    expires = parsedate_tz(info.getheader('Expires', ''))
+    date = parsedate_tz(info.getheader('Date', ''))
+    if expires:
+        return now + mktime_tz(expires) - (mktime_tz(date) if date else now)
+    return now
+
+
+def _respond(entry, url, body=True):
+    resp = addinfourl(StringIO(entry['body'] if body else ''),
+                      Message(StringIO(entry['headers'])), url)
+    resp.code = 200
+    resp.msg = 'OK'
+    return resp
+
+
+def _entryName(url):
+    return sha1(url).hexdigest()
+
+
+def _storeEntry(store, url, entry):
+    '''Write `entry` to a file of its own, then move it into place, so
+    that readers see all of it or none.
+
+    Header bytes are carried through JSON as latin-1, as in
+    `rewalk.dumps`.
+    '''
+    meta = dict((k, v) for (k, v) in entry.items() if k != 'body')
+    name = _entryName(url)
+    part = store.subEdFile('%s.%x' % (name, id(entry)))
+    part.setBytes(json.dumps(meta, encoding='latin-1') + '\n' +
+                  entry['body'])
+    part.renameTo(store.subEdFile(name))
+
+
+def _loadEntry(store, url):
+    rd = store.ro().subRdFile(_entryName(url))
+    if not rd.exists():
+        return None
+    try:
+        meta, body = rd.getBytes().split('\n', 1)
+        entry = dict((str(k), v.encode('latin-1') if isinstance(v, unicode)
+                      else v)
+                     for (k, v) in json.loads(meta).items())
+    except (IOError, ValueError):  # e.g. gone, or cut short
+        return None
+    entry['body'] = body
+    return entry
+
+
+class _MockOrigin(object):
+    '''Origin server with ETags: resources map paths to
+    (etag, cache-control, body).
+    '''
+    def __init__(self, resources):
+        self.resources = resources
+        self.log = []
+
+    def open(self, request_or_address, content=None):
+        from urllib2 import HTTPError
+
+        try:
+            url = request_or_address.get_full_url()
+            method = request_or_address.get_method()
+            etag = request_or_address.get_header('If-none-match')
+        except AttributeError:
+            url, method, etag = request_or_address, 'GET', None
+        path = url[len('http://example'):]
+        self.log.append(' '.join([method, path] +
+                                 (['If-None-Match'] if etag else [])))
+        if path not in self.resources:
+            raise HTTPError(url, 404, 'Not Found', Message(StringIO('')),
+                            StringIO(''))
+        tag, cc, body = self.resources[path]
+        headers = Message(StringIO('ETag: %s\r\nCache-Control: %s\r\n'
+                                   % (tag, cc)))
+        if etag == tag:
+            raise HTTPError(url, 304, 'Not Modified', headers, StringIO(''))
+        resp = addinfourl(StringIO(body if method == 'GET' else ''),
+                          headers, url)
+        resp.code = 200
+        return resp
+
+
+class _MockClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _Request(url, data=None, headers={}):
+    from urllib2 import Request
+    return Request(url, data, headers)
+
+
+def _HeadRequest(url):
+    from urllib2 import Request
+
+    class HeadRequest(Request):
+        def get_method(self):
+            return 'HEAD'
+    return HeadRequest(url)
@@ -0,0 +1,303 @@
+'''webpool -- persistent, pooled HTTP connections for urllib2
+
+The default urllib2 opener makes a new TCP connection for each
+request. An opener built on a `ConnectionPool` keeps connections
+alive and reuses them, so a `WebReadable` root and all of its
+subordinates, which share their `urlopener`, share connections too::
+
+  >>> server, base = _serveLocal(_Pages)
+  >>> pool = ConnectionPool(maxPerHost=2)
+  >>> urlopener = build_pooled_opener(pool)
+  >>> [urlopener.open(base + n).read() for n in ['a', 'b', 'c']]
+  ['page /a', 'page /b', 'page /c']
+  >>> sorted(pool.stats().items())
+  [('idle', 1), ('opened', 1), ('reused', 2)]
+
+HEAD requests, as from `WebReadable.exists()`, free their connection
+at once::
+
+  >>> from urllib2 import Request
+  >>> class HeadRequest(Request):
+  ...     def get_method(self):
+  ...         return 'HEAD'
+  >>> urlopener.open(HeadRequest(base)).code
+  200
+  >>> pool.stats()['idle']
+  1
+
+  >>> pool.close(); server.shutdown()
+
+'''
+
+import httplib
+import socket
+import time
+import urllib2
+import zlib
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from threading import BoundedSemaphore, Lock, Thread
+
+from encap import ESuite
+
+
+class ConnectionPool(ESuite):
+    '''Idle keep-alive connections, at most `maxPerHost` per host
+    in use at once; connections idle longer than `idleTimeout`
+    seconds are closed rather than reused.
+    '''
+    def __new__(cls, maxPerHost=4, idleTimeout=30.0, clock=time.time):
+        idle = {}   # key -> [(conn, since)]
+        slots = {}  # key -> BoundedSemaphore
+        lock = Lock()
+        counts = {'opened': 0, 'reused': 0}
+
+        def checkout(_, key, connect):
+            '''Get a connection for `key`, waiting for a free slot.
+
+            :return: (connection, reused)
+            '''
+            with lock:
+                slot = slots.get(key)
+                if slot is None:
+                    slot = slots[key] = BoundedSemaphore(maxPerHost)
+            slot.acquire()
+            stale = []
+            with lock:
+                conns = idle.get(key, [])
+                while conns:
+                    conn, since = conns.pop()
+                    if clock() - since <= idleTimeout:
+                        counts['reused'] += 1
+                        return conn, True
+                    stale.append(conn)
+                counts['opened'] += 1
+            for conn in stale:
+                conn.close()
+            try:
+                return connect(), False
+            except:
+                slot.release()
+                raise
+
+        def checkin(_, key, conn, reusable=True):
+            if reusable:
+                with lock:
+                    idle.setdefault(key, []).append((conn, clock()))
+            else:
+                conn.close()
+            slots[key].release()
+
+        def stats(_):
+            with lock:
+                return dict(counts,
+                            idle=sum(len(conns) for conns in idle.values()))
+
+        def close(_):
+            with lock:
+                conns = [c for cs in idle.values() for (c, _) in cs]
+                idle.clear()
+            for conn in conns:
+                conn.close()
+
+        return cls.make(checkout, checkin, stats, close)
+
+
+class PooledHTTPHandler(urllib2.HTTPHandler):
+    def __init__(self, pool, debuglevel=0):
+        urllib2.HTTPHandler.__init__(self, debuglevel)
+        self._pool = pool
+
+    def http_open(self, req):
+        return _pooledOpen(self._pool, 'http', httplib.HTTPConnection, req)
+
+
+class PooledHTTPSHandler(urllib2.HTTPSHandler):
+    def __init__(self, pool, debuglevel=0):
+        urllib2.HTTPSHandler.__init__(self, debuglevel)
+        self._pool = pool
+
+    def https_open(self, req):
+        return _pooledOpen(self._pool, 'https', httplib.HTTPSConnection,
+                           req)
+
+
+def build_pooled_opener(pool, *handlers):
+    '''Build a urllib2 opener whose HTTP(S) connections come from `pool`.
+    '''
+    return urllib2.build_opener(PooledHTTPHandler(pool),
+                                PooledHTTPSHandler(pool), *handlers)
+
+
+_IDEMPOTENT = ('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS')
+
+
+def _pooledOpen(pool, scheme, http_class, req):
+    '''Like `AbstractHTTPHandler.do_open`, but keep the connection.
+    '''
+    host = req.get_host()
+    if not host:
+        raise urllib2.URLError('no host given')
+
+    headers = dict(req.unredirected_hdrs)
+    headers.update(dict((k, v) for k, v in req.headers.items()
+                        if k not in headers))
+    headers = dict((name.title(), val) for name, val in headers.items())
+    method = req.get_method()
+    key = (scheme, host)
+
+    while True:
+        h, reused = pool.checkout(
+            key, lambda: http_class(host, timeout=req.timeout))
+        try:
+            h.request(method, req.get_selector(), req.data, headers)
+            r = h.getresponse(buffering=True)
+            break
+        except (socket.error, httplib.HTTPException) as err:
+            pool.checkin(key, h, reusable=False)
+            # The server may have dropped an idle connection; try again
+            # on a fresh one, if that can't do any harm.
+            if not (reused and method in _IDEMPOTENT):
+                raise urllib2.URLError(err)
+
+    if r.length == 0:
+        r.read()  # nothing to wait for; free the connection now
+
+    body = _Body(r, lambda ok: pool.checkin(key, h, ok and not r.will_close))
+    resp = urllib2.addinfourl(socket._fileobject(body, close=True),
+                              r.msg, req.get_full_url())
+    resp.code = r.status
+    resp.msg = r.reason
+    return resp
+
+
+class _Body(object):
+    '''Give the connection back once the response is read (or
+    dropped); close it if the response was abandoned part way.
+    '''
+    def __init__(self, r, release):
+        self._r = r
+        self._release = release
+        self._check()
+
+    def _check(self):
+        if self._release is not None and self._r.isclosed():
+            self._done(True)
+
+    def _done(self, ok):
+        release, self._release = self._release, None
+        if release is not None:
+            release(ok)
+
+    def recv(self, amt=None):
+        data = self._r.read(amt)
+        self._check()
+        return data
+
+    read = recv
+
+    def close(self):
+        self._done(self._r.isclosed())
+        self._r.close()
+
+    def __del__(self):
+        self._done(False)
+
+
+def _serveLocal(handler_class):
+    '''Serve on an ephemeral localhost port from a daemon thread.
+
+    :return: (server, base URL)
+    '''
+    class Server(ThreadingMixIn, HTTPServer):
+        daemon_threads = True
+
+    server = Server(('127.0.0.1', 0), handler_class)
+    t = Thread(target=server.serve_forever)
+    t.daemon = True
+    t.start()
+    return server, 'http://127.0.0.1:%d/' % server.server_address[1]
+
+
+class _Pages(BaseHTTPRequestHandler):
+    '''Keep-alive stand-in server: each path has a small page.
+    '''
+    protocol_version = 'HTTP/1.1'
+    wbufsize = -1  # one segment per response, rather than per header
+    disable_nagle_algorithm = True
+
+    def do_HEAD(self):
+        self._reply(False)
+
+    def do_GET(self):
+        self._reply(True)
+
+    def _reply(self, body):
+        content = 'page ' + self.path
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        if body:
+            self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Site(BaseHTTPRequestHandler):
+    '''Stand-in web site: directory pages list links, some of which
+    lead elsewhere, or back up, or repeat.
+    '''
+    pages = {
+        '/': ('text/html', '<a href="a.txt">a</a><a href="docs/">docs</a>'
+              '<a href="/">home</a><a href="http://elsewhere/">x</a>'),
+        '/docs/': ('text/html; charset=utf-8',
+                   '<link href="../"><a href="b.txt">b</a>'
+                   '<a href="/docs/../a.txt">a</a>'
+                   '<a href="c.txt#part">c</a><a href="./b.txt">b</a>'),
+        '/a.txt': ('text/plain', 'a'),
+        '/docs/b.txt': ('text/plain', 'b'),
+        '/docs/c.txt': ('text/plain', 'c'),
+    }
+
+    def do_GET(self):
+        if self.path not in self.pages:
+            self.send_error(404)
+            return
+        ctype, content = self.pages[self.path]
+        self.send_response(200)
+        self.send_header('Content-Type', ctype)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Ingest(BaseHTTPRequestHandler):
+    '''Keep-alive stand-in for an event-ingest endpoint: answer each
+    line posted to `/` with a result line; other paths are not found.
+    '''
+    protocol_version = 'HTTP/1.1'
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.getheader('Content-Length')))
+        if self.path != '/':
+            self.send_error(404)
+            return
+        if self.headers.getheader('Content-Encoding') == 'gzip':
+            body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+        content = ''.join('received: %s\n' % line
+                          for line in body.split('\n')[:-1])
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass